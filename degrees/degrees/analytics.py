@@ -0,0 +1,214 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from snapshot import load_or_compile
+
+# Rough bytes of working memory per source in a batch, per person and
+# movie: the seen and fresh flags plus the int64 keys of a level
+BYTES_PER_NODE = 18
+
+
+def expand(indptr, indices, rows):
+    """
+    Gathers the CSR rows listed in `rows` in one vectorized step.
+
+    Returns (owner, values), where values are the concatenated row
+    contents and owner[i] is the position in `rows` values[i] came from.
+    """
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, indices[np.repeat(starts, counts) + offsets]
+
+
+def mark_new(seen, keys):
+    """
+    Marks keys as seen and returns, in sorted order and without
+    duplicates, the ones that had not been seen before. Scattering into
+    a dense flag array is much cheaper than sorting the keys.
+    """
+    fresh = np.zeros_like(seen)
+    fresh[keys[~seen[keys]]] = True
+    seen |= fresh
+    return np.flatnonzero(fresh)
+
+
+def batch_search(graph, sources):
+    """
+    Runs a level-synchronous breadth-first search from every person in
+    sources at once. Each (source, person) pair is a key in one flat
+    array, so a whole level of every search expands as a few vectorized
+    gathers over the CSR arrays.
+
+    Yields (level, batch, people) for each level, where batch[i] is the
+    position in sources of the search that first reached people[i].
+    """
+    people = graph.person_count()
+    movies = graph.movie_count()
+    person_seen = np.zeros(len(sources) * people, dtype=bool)
+    movie_seen = np.zeros(len(sources) * movies, dtype=bool)
+
+    batch = np.arange(len(sources), dtype=np.int64)
+    frontier = np.asarray(sources, dtype=np.int64)
+    person_seen[batch * people + frontier] = True
+    level = 0
+    while len(frontier):
+        level += 1
+
+        # People to movies, keeping each search's unseen movies
+        owner, movie = expand(graph.person_indptr, graph.person_indices,
+                              frontier)
+        keys = mark_new(movie_seen, batch[owner] * movies + movie)
+
+        # Movies to stars, keeping each search's unseen people
+        owner, star = expand(graph.movie_indptr, graph.movie_indices,
+                             keys % movies)
+        keys = mark_new(person_seen, (keys // movies)[owner] * people + star)
+
+        batch, frontier = keys // people, keys % people
+        if len(frontier):
+            yield level, batch, frontier
+
+
+def connected_components(graph):
+    """
+    Labels every person with the smallest person index in their
+    connected component, by propagating minimum labels through movies
+    until nothing changes.
+    """
+    people = graph.person_count()
+    labels = np.arange(people, dtype=np.int64)
+    movie_starts = graph.movie_indptr[:-1]
+    person_starts = graph.person_indptr[:-1]
+    has_stars = graph.movie_indptr[1:] > movie_starts
+    has_movies = graph.person_indptr[1:] > person_starts
+    movie_labels = np.zeros(graph.movie_count(), dtype=np.int64)
+
+    while True:
+        if len(graph.movie_indices):
+            reduced = np.minimum.reduceat(labels[graph.movie_indices],
+                                          movie_starts[has_stars])
+            movie_labels[has_stars] = reduced
+        updated = labels.copy()
+        if len(graph.person_indices):
+            reduced = np.minimum.reduceat(movie_labels[graph.person_indices],
+                                          person_starts[has_movies])
+            updated[has_movies] = np.minimum(labels[has_movies], reduced)
+
+        # Jump each label to its own label to halve long chains
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def batch_size(graph, memory_mb):
+    """Returns how many searches fit in the memory budget at once."""
+    per_source = BYTES_PER_NODE * (graph.person_count() + graph.movie_count())
+    return max(1, int(memory_mb * 2**20) // per_source)
+
+
+def analyze(graph, sources, memory_mb=512, progress=None):
+    """
+    Runs a breadth-first search from every person in sources.
+
+    Returns (histogram, reached, distance_sums), where histogram[d] is
+    the number of (source, person) pairs d degrees apart and, for every
+    person, reached and distance_sums count the sources that reached
+    them and the sum of their distances from those sources.
+    """
+    people = graph.person_count()
+    histogram = {}
+    reached = np.zeros(people, dtype=np.int64)
+    distance_sums = np.zeros(people, dtype=np.int64)
+
+    size = batch_size(graph, memory_mb)
+    sources = np.asarray(sources, dtype=np.int64)
+    for start in range(0, len(sources), size):
+        for level, _, found in batch_search(graph,
+                                            sources[start:start + size]):
+            histogram[level] = histogram.get(level, 0) + len(found)
+            counts = np.bincount(found, minlength=people)
+            reached += counts
+            distance_sums += level * counts
+        if progress is not None:
+            progress(min(start + size, len(sources)), len(sources))
+    return histogram, reached, distance_sums
+
+
+def closeness(reached, distance_sums, samples):
+    """
+    Approximates closeness centrality of every person from their
+    distances to the sampled sources, scaled by the fraction of
+    samples that could reach them at all.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (reached / distance_sums) * (reached / max(samples, 1))
+    return np.nan_to_num(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--samples", type=int, default=1000,
+                        help="number of random source people")
+    parser.add_argument("--all", action="store_true",
+                        help="search from every person")
+    parser.add_argument("--memory-mb", type=float, default=512)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    graph = load_or_compile(args.directory)
+    people = graph.person_count()
+    if args.all:
+        sources = np.arange(people)
+    else:
+        rng = np.random.default_rng(args.seed)
+        sources = rng.choice(people, size=min(args.samples, people),
+                             replace=False)
+
+    started = time.perf_counter()
+
+    def progress(done, total):
+        elapsed = time.perf_counter() - started
+        remaining = elapsed / done * (total - done)
+        print(f"  {done}/{total} sources, {elapsed:.1f}s elapsed, "
+              f"~{remaining:.1f}s remaining", file=sys.stderr)
+
+    print(f"Searching from {len(sources)} people, "
+          f"{batch_size(graph, args.memory_mb)} at a time...",
+          file=sys.stderr)
+    histogram, reached, distance_sums = analyze(
+        graph, sources, args.memory_mb, progress
+    )
+
+    print("Degrees of separation:")
+    pairs = sum(histogram.values())
+    for level in sorted(histogram):
+        share = histogram[level] / pairs
+        print(f"  {level}: {histogram[level]} pairs ({share:.2%})")
+    if pairs:
+        mean = sum(level * count for level, count in histogram.items()) / pairs
+        print(f"  mean: {mean:.3f}, max: {max(histogram)}")
+
+    labels = connected_components(graph)
+    sizes = np.bincount(labels, minlength=people)
+    largest = int(np.argmax(sizes))
+    print(f"Largest connected component: {sizes[largest]} of {people} "
+          f"people ({sizes[largest] / people:.2%})")
+
+    print("Most central people (approximate closeness):")
+    scores = closeness(reached, distance_sums, len(sources))
+    for person in np.argsort(-scores)[:args.top].tolist():
+        print(f"  {graph.person_names[person]} ({graph.person_ids[person]}):"
+              f" {scores[person]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import argparse
+import http.client
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+import degrees
+import parallel
+import service
+import util
+from graph import load_graph
+from stats import SearchStats
+
+
+def search_benchmark(directory, pairs, seed, compact, stats_file=None):
+    """
+    Compares the one-sided and bidirectional searches on random pairs
+    of people, reporting nodes expanded and wall time for each.
+
+    With stats_file, the pairs are searched again with instrumentation
+    and the statistics of each search are written there as JSON.
+    """
+    degrees.load_data(directory, compact=compact)
+    rng = random.Random(seed)
+    if compact:
+        person_ids = sorted(degrees.graph.person_ids)
+    else:
+        person_ids = sorted(degrees.people)
+    queries = [(rng.choice(person_ids), rng.choice(person_ids))
+               for _ in range(pairs)]
+
+    searches = [
+        ("bfs", degrees.breadth_first_search),
+        ("bidirectional", degrees.bidirectional_search)
+    ]
+    print(f"{'search':<15} {'pairs':>6} {'expanded':>12} {'seconds':>10}")
+    for name, search in searches:
+        expanded = 0
+        start = time.perf_counter()
+        for source, target in queries:
+            if compact:
+                _, explored = search(degrees.graph.person_index(source),
+                                     degrees.graph.person_index(target),
+                                     neighbors=degrees.graph.neighbors)
+            else:
+                _, explored = search(source, target)
+            expanded += explored
+        elapsed = time.perf_counter() - start
+        print(f"{name:<15} {pairs:>6} {expanded:>12} {elapsed:>10.3f}")
+
+    if stats_file is None:
+        return
+    if compact:
+        people = degrees.graph.person_count()
+        movies = degrees.graph.movie_count()
+    else:
+        people, movies = len(degrees.people), len(degrees.movies)
+    results = []
+    for bidirectional in [False, True]:
+        stats = SearchStats()
+        for source, target in queries:
+            degrees.shortest_path(source, target, bidirectional=bidirectional,
+                                  stats=stats)
+        results.append(stats.as_dict(
+            search="bidirectional" if bidirectional else "bfs",
+            directory=directory, people=people, movies=movies,
+            pairs=pairs, seed=seed
+        ))
+    with open(stats_file, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def frontier_benchmark(sizes, ops):
+    """
+    Times contains_state and remove on list-backed and deque-backed
+    frontiers that already hold `size` nodes, in microseconds per call.
+    """
+    frontiers = [
+        ("StackFrontier", util.StackFrontier),
+        ("QueueFrontier", util.QueueFrontier),
+        ("DequeStackFrontier", util.DequeStackFrontier),
+        ("DequeQueueFrontier", util.DequeQueueFrontier)
+    ]
+    print(f"{'frontier':<20} {'size':>8} {'contains us':>12} {'remove us':>10}")
+    for size in sizes:
+        for name, Frontier in frontiers:
+            frontier = Frontier()
+            for state in range(size):
+                frontier.add(util.Node(state, None, None))
+
+            # Probe states spread over the whole frontier, plus misses
+            probes = [(i * size) // ops for i in range(ops // 2)]
+            probes += [size + i for i in range(ops - len(probes))]
+            start = time.perf_counter()
+            for state in probes:
+                frontier.contains_state(state)
+            contains = (time.perf_counter() - start) / ops * 1e6
+
+            start = time.perf_counter()
+            for _ in range(min(ops, size)):
+                frontier.remove()
+            remove = (time.perf_counter() - start) / min(ops, size) * 1e6
+
+            print(f"{name:<20} {size:>8} {contains:>12.2f} {remove:>10.2f}")
+
+
+def memory_benchmark(directory):
+    """
+    Reports load time, traced memory and neighbor expansion time of the
+    dict representation against the compact CSR graph.
+    """
+    print(f"{'representation':<15} {'load s':>8} {'peak MB':>9} "
+          f"{'retained MB':>12} {'expand us':>10}")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    degrees.load_data(directory)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    person_ids = list(degrees.people)[:10000]
+    start = time.perf_counter()
+    for person_id in person_ids:
+        degrees.neighbors_for_person(person_id)
+    expand = (time.perf_counter() - start) / len(person_ids) * 1e6
+    print(f"{'dict':<15} {elapsed:>8.2f} {peak / 2**20:>9.1f} "
+          f"{retained / 2**20:>12.1f} {expand:>10.2f}")
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    graph = load_graph(directory)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    people = range(min(10000, graph.person_count()))
+    start = time.perf_counter()
+    for person in people:
+        list(graph.neighbors(person))
+    expand = (time.perf_counter() - start) / len(people) * 1e6
+    print(f"{'csr':<15} {elapsed:>8.2f} {peak / 2**20:>9.1f} "
+          f"{retained / 2**20:>12.1f} {expand:>10.2f}")
+    print(f"CSR arrays: {graph.nbytes() / 2**20:.1f} MB")
+
+
+def service_benchmark(directory, pairs, seed, snapshot):
+    """
+    Reports queries per second for the same random name pairs answered
+    by run_batch and by a local QueryServer over one HTTP connection.
+    """
+    degrees.load_data(directory, compact=snapshot, snapshot=snapshot)
+    rng = random.Random(seed)
+    if degrees.graph is None:
+        person_names = [person["name"] for person in degrees.people.values()]
+    else:
+        person_names = list(degrees.graph.person_names)
+    queries = [(rng.choice(person_names), rng.choice(person_names))
+               for _ in range(pairs)]
+
+    lines = [f"{source}\t{target}\n" for source, target in queries]
+    count, seconds = service.run_batch(lines, io.StringIO())
+    print(f"batch:  {count} queries, {count / seconds:.1f} queries/s")
+
+    server = service.QueryServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    start = time.perf_counter()
+    for source, target in queries:
+        query = urlencode({"source": source, "target": target})
+        connection.request("GET", f"/path?{query}")
+        json.loads(connection.getresponse().read())
+    seconds = time.perf_counter() - start
+    connection.close()
+    server.shutdown()
+    server.server_close()
+    print(f"server: {pairs} queries, {pairs / seconds:.1f} queries/s")
+
+
+def parallel_benchmark(directory, pairs, sources, processes, seed,
+                       tree_cost):
+    """
+    Times parallel_shortest_paths on the same random pairs with each
+    worker count, against one-at-a-time bidirectional searches. Each
+    count runs with only bidirectional searches, only search trees, and
+    the choice between them made by tree_cost.
+    """
+    degrees.load_data(directory, snapshot=True)
+    graph = degrees.graph
+    rng = random.Random(seed)
+    person_ids = list(graph.person_ids)
+    roots = [rng.choice(person_ids) for _ in range(sources)]
+    queries = [(rng.choice(roots), rng.choice(person_ids))
+               for _ in range(pairs)]
+
+    start = time.perf_counter()
+    expected = [degrees.shortest_path(source, target, bidirectional=True)
+                for source, target in queries]
+    serial = time.perf_counter() - start
+    print(f"{'workers':<10} {'searches':<14} {'seconds':>10} {'speedup':>8}")
+    print(f"{'serial':<10} {'bidirectional':<14} {serial:>10.3f} {1:>8.2f}")
+
+    strategies = [("bidirectional", math.inf), ("tree", 0),
+                  (f"cost {tree_cost:g}", tree_cost)]
+    for count in processes:
+        for name, cost in strategies:
+            start = time.perf_counter()
+            paths = parallel.parallel_shortest_paths(
+                graph, queries, processes=count, tree_cost=cost
+            )
+            elapsed = time.perf_counter() - start
+            if [path is None or len(path) for path in paths] != [
+                path is None or len(path) for path in expected
+            ]:
+                sys.exit("Parallel path lengths differ from shortest_path")
+            print(f"{count:<10} {name:<14} {elapsed:>10.3f} "
+                  f"{serial / elapsed:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    search = subparsers.add_parser("search")
+    search.add_argument("directory", nargs="?", default="large")
+    search.add_argument("--pairs", type=int, default=100)
+    search.add_argument("--seed", type=int, default=0)
+    search.add_argument("--compact", action="store_true")
+    search.add_argument("--stats", metavar="FILE",
+                        help="also write instrumented search statistics")
+
+    frontier = subparsers.add_parser("frontier")
+    frontier.add_argument("--sizes", type=int, nargs="+",
+                          default=[1000, 10000, 100000, 300000])
+    frontier.add_argument("--ops", type=int, default=100)
+
+    memory = subparsers.add_parser("memory")
+    memory.add_argument("directory", nargs="?", default="large")
+
+    throughput = subparsers.add_parser("service")
+    throughput.add_argument("directory", nargs="?", default="large")
+    throughput.add_argument("--pairs", type=int, default=1000)
+    throughput.add_argument("--seed", type=int, default=0)
+    throughput.add_argument("--snapshot", action="store_true")
+
+    scaling = subparsers.add_parser("parallel")
+    scaling.add_argument("directory", nargs="?", default="large")
+    scaling.add_argument("--pairs", type=int, default=1000)
+    scaling.add_argument("--sources", type=int, default=50)
+    scaling.add_argument("--processes", type=int, nargs="+",
+                         default=list(range(1, (os.cpu_count() or 1) + 1)))
+    scaling.add_argument("--seed", type=int, default=0)
+    scaling.add_argument("--tree-cost", type=float,
+                         default=parallel.TREE_COST)
+
+    args = parser.parse_args()
+    if args.benchmark == "search":
+        search_benchmark(args.directory, args.pairs, args.seed, args.compact,
+                         args.stats)
+    elif args.benchmark == "frontier":
+        frontier_benchmark(args.sizes, args.ops)
+    elif args.benchmark == "memory":
+        memory_benchmark(args.directory)
+    elif args.benchmark == "service":
+        service_benchmark(args.directory, args.pairs, args.seed, args.snapshot)
+    elif args.benchmark == "parallel":
+        parallel_benchmark(args.directory, args.pairs, args.sources,
+                           args.processes, args.seed, args.tree_cost)
+    else:
+        sys.exit(f"Unknown benchmark {args.benchmark}")
+
+
+if __name__ == "__main__":
+    main()
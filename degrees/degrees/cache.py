@@ -0,0 +1,126 @@
+import sys
+from collections import Counter, OrderedDict
+
+from graph import tree_path
+
+# Rough bytes held per person in a cached search tree: the dict slot,
+# its key and the (movie, parent) tuple
+ENTRY_BYTES = 120
+
+
+def reverse_path(path, source):
+    """
+    Turns a path from source to some target into the path from that
+    target back to source, in the same (movie, person) format.
+    """
+    people = [source] + [person for _, person in path]
+    movies = [movie for movie, _ in path]
+    return [(movies[i], people[i]) for i in range(len(movies) - 1, -1, -1)]
+
+
+class SearchCache():
+    """
+    Caches shortest paths between people.
+
+    Complete search trees are kept in an LRU keyed by source within
+    memory_budget bytes, so any later query from or to that person is
+    answered by walking parents. A tree is only built for a person once
+    they have appeared in tree_after queries. Exact pair results are
+    kept in a second LRU of pair_capacity entries.
+    """
+
+    def __init__(self, memory_budget=64 * 2**20, pair_capacity=10000,
+                 tree_after=2):
+        self.memory_budget = memory_budget
+        self.pair_capacity = pair_capacity
+        self.tree_after = tree_after
+        self.trees = OrderedDict()
+        self.tree_bytes = {}
+        self.pairs = OrderedDict()
+        self.queries = Counter()
+        self.used = 0
+        self.counters = Counter()
+
+    def lookup(self, source, target):
+        """
+        Returns (True, path) if the path between source and target is
+        known from a cached pair or search tree, otherwise (False, None).
+        """
+        key = (source, target)
+        if key in self.pairs:
+            self.pairs.move_to_end(key)
+            self.counters["pair_hits"] += 1
+            return True, self.pairs[key]
+        self.counters["pair_misses"] += 1
+
+        if source in self.trees:
+            self.trees.move_to_end(source)
+            self.counters["tree_hits"] += 1
+            return True, tree_path(self.trees[source], target)
+        if target in self.trees:
+            self.trees.move_to_end(target)
+            self.counters["tree_hits"] += 1
+            path = tree_path(self.trees[target], source)
+            return True, None if path is None else reverse_path(path, target)
+        self.counters["tree_misses"] += 1
+        return False, None
+
+    def store_pair(self, source, target, path):
+        self.pairs[(source, target)] = path
+        self.pairs.move_to_end((source, target))
+        while len(self.pairs) > self.pair_capacity:
+            self.pairs.popitem(last=False)
+            self.counters["pair_evictions"] += 1
+
+    def wants_tree(self, person):
+        """
+        Counts a query involving person and returns True once they are
+        popular enough to be worth a complete search tree.
+        """
+        self.queries[person] += 1
+        return (person not in self.trees
+                and self.queries[person] >= self.tree_after)
+
+    def store_tree(self, source, parents):
+        """
+        Caches a complete search tree, evicting the least recently used
+        trees until it fits. Trees larger than the budget are not kept.
+        """
+        size = sys.getsizeof(parents) + ENTRY_BYTES * len(parents)
+        if size > self.memory_budget:
+            self.counters["tree_rejections"] += 1
+            return
+        if source in self.trees:
+            self.used -= self.tree_bytes.pop(source)
+            del self.trees[source]
+        while self.used + size > self.memory_budget:
+            evicted, _ = self.trees.popitem(last=False)
+            self.used -= self.tree_bytes.pop(evicted)
+            self.counters["tree_evictions"] += 1
+
+            # Make an evicted person earn their tree again, so trees
+            # that do not fit together are not rebuilt on every query
+            self.queries[evicted] = 0
+        self.trees[source] = parents
+        self.tree_bytes[source] = size
+        self.used += size
+
+    def clear(self):
+        self.trees.clear()
+        self.tree_bytes.clear()
+        self.pairs.clear()
+        self.queries.clear()
+        self.used = 0
+
+    def stats(self):
+        """Returns the cache counters and sizes as a dict."""
+        stats = {
+            name: self.counters[name]
+            for name in ["pair_hits", "pair_misses", "pair_evictions",
+                         "tree_hits", "tree_misses", "tree_evictions",
+                         "tree_rejections"]
+        }
+        stats["pairs"] = len(self.pairs)
+        stats["trees"] = len(self.trees)
+        stats["tree_bytes"] = self.used
+        return stats
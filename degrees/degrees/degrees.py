@@ -1,7 +1,12 @@
+import argparse
 import csv
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import load_graph
+from nameindex import NameIndex
+from snapshot import load_or_compile
+from stats import SearchStats
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +17,34 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed graph, used instead of the dicts above
+# when the data is loaded with compact=True or snapshot=True
+graph = None
 
-def load_data(directory):
+# Ranked prefix and typo-tolerant name lookup, built on first use
+name_index = None
+
+# Ways person_id_for_name can resolve a name shared by several people
+POLICIES = ["prompt", "popular", "strict"]
+
+
+def load_data(directory, compact=False, snapshot=False):
     """
     Load data from CSV files into memory.
+
+    With snapshot=True the graph is memory-mapped from a binary snapshot
+    of the directory, which is compiled first if missing or stale.
     """
+    global graph, name_index
+    name_index = None
+    if snapshot:
+        graph = load_or_compile(directory)
+        return
+    if compact:
+        graph = load_graph(directory)
+        return
+    graph = None
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -53,23 +81,39 @@ def load_data(directory):
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(usage="python degrees.py [directory]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--compact", action="store_true",
+                        help="load the data as an integer-indexed graph")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="memory-map a compiled snapshot of the data")
+    parser.add_argument("--policy", choices=POLICIES, default="prompt",
+                        help="how to resolve a name shared by several people")
+    parser.add_argument("--stats", metavar="FILE",
+                        help="write search statistics to FILE as JSON")
+    args = parser.parse_args()
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory, compact=args.compact, snapshot=args.snapshot)
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = person_id_for_name(input("Name: "), args.policy)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), args.policy)
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    stats = SearchStats() if args.stats else None
+    path = shortest_path(source, target, bidirectional=args.bidirectional,
+                         stats=stats)
+    if stats is not None:
+        with open(args.stats, "w") as f:
+            f.write(stats.to_json(directory=args.directory,
+                                  bidirectional=args.bidirectional))
 
     if path is None:
         print("Not connected.")
@@ -78,22 +122,117 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_name(path[i][1])
+            person2 = person_name(path[i + 1][1])
+            movie = movie_title(path[i + 1][0])
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False, cache=None,
+                  stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    A SearchCache passed as cache is consulted before searching and
+    updated afterwards. It holds paths for the data loaded at the time,
+    so it must be cleared whenever load_data is called again.
+    A SearchStats passed as stats records the cost of the search.
     """
-    ...
+    if stats is None:
+        return find_path(source, target, bidirectional, cache, None)
+    stats.searches += 1
+    with stats.timer("total"):
+        path = find_path(source, target, bidirectional, cache, stats)
+    if path is not None:
+        stats.found += 1
+    return path
+
+
+def find_path(source, target, bidirectional, cache, stats):
+    """Runs the search for shortest_path on the loaded representation."""
+    if graph is None:
+        return cached_search(source, target, bidirectional, cache, stats,
+                             neighbors_for_person, breadth_first_tree)
+
+    # Search over dense indices and translate the path back to IMDB ids
+    path = cached_search(graph.person_index(source),
+                         graph.person_index(target),
+                         bidirectional, cache, stats,
+                         graph.neighbors, graph.search_tree)
+    if path is None:
+        return None
+    return [(graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in path]
+
+
+def cached_search(source, target, bidirectional, cache, stats,
+                  neighbors, tree):
+    """
+    Finds the path between source and target with the chosen search,
+    answering from cache where possible. `tree` builds the complete
+    search tree of a person once the cache finds them popular.
+    """
+    if cache is not None:
+        if stats is None:
+            found, path = cache.lookup(source, target)
+        else:
+            with stats.timer("cache"):
+                found, path = cache.lookup(source, target)
+        if found:
+            return path
+
+    search = bidirectional_search if bidirectional else breadth_first_search
+    if stats is None:
+        path, _ = search(source, target, neighbors=neighbors)
+    else:
+        with stats.timer("search"):
+            path, _ = search(source, target, neighbors=neighbors, stats=stats)
+
+    if cache is not None:
+        cache.store_pair(source, target, path)
+        for person in (source, target):
+            if cache.wants_tree(person):
+                if stats is None:
+                    cache.store_tree(person, tree(person))
+                else:
+                    with stats.timer("tree"):
+                        cache.store_tree(person, tree(person))
+    return path
+
+
+def timed_neighbors(neighbors, stats):
+    """
+    Wraps a neighbors function so that the time spent in it and the
+    number of (movie, person) pairs it returns are added to stats.
+    """
+    def wrapper(person):
+        with stats.timer("neighbors"):
+            pairs = list(neighbors(person))
+        stats.edges += len(pairs)
+        return pairs
+    return wrapper
+
+
+def breadth_first_search(source, target, neighbors=None, stats=None):
+    """
+    Searches outwards from the source until the target is removed
+    from the frontier. `neighbors` maps a person to their
+    (movie, person) pairs and defaults to neighbors_for_person.
+    Expansions, edges and duplicates are recorded in stats if given.
+
+    Returns a (path, explored) pair, where explored is the number
+    of people whose neighbors were expanded.
+    """
+    if neighbors is None:
+        neighbors = neighbors_for_person
+    if stats is not None:
+        neighbors = timed_neighbors(neighbors, stats)
+
     start = Node(source, None, None)
-    Frontier = QueueFrontier()
+    Frontier = DequeQueueFrontier()
 
     Frontier.add(start)
 
@@ -102,51 +241,202 @@ def shortest_path(source, target):
 
     while True:
         if Frontier.empty():
-            return None
+            return None, explorednum
 
         node = Frontier.remove()
         explorednum += 1
-        
+        if stats is not None:
+            stats.expand(node.state, len(Frontier.frontier) + 1)
+
         if node.state == target:
-            path=[]
+            path = []
             while node.parent is not None:
                 path.append((node.action, node.state))
                 node = node.parent
             path.reverse()
 
-            return path
+            return path, explorednum
         explored.add(node.state)
 
-        for movieid, personid in neighbors_for_person(node.state):
+        for movieid, personid in neighbors(node.state):
             if not Frontier.contains_state(personid) and personid not in explored:
                 child = Node(state=personid, parent=node, action=movieid)
                 Frontier.add(child)
+            elif stats is not None:
+                stats.duplicates += 1
+
 
-            
-def person_id_for_name(name):
+def bidirectional_search(source, target, neighbors=None, stats=None):
+    """
+    Grows one frontier from the source and one from the target,
+    a whole level at a time, always expanding the smaller of the two.
+    Stops as soon as a newly reached person has already been reached
+    from the other side. `neighbors` and `stats` are as in
+    breadth_first_search.
+
+    Returns a (path, explored) pair, where explored is the number
+    of people whose neighbors were expanded.
+    """
+    if neighbors is None:
+        neighbors = neighbors_for_person
+    if stats is not None:
+        neighbors = timed_neighbors(neighbors, stats)
+    if source == target:
+        return [], 0
+
+    # Maps each reached person to the (movie_id, person_id) step
+    # leading back towards the side's starting person
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+    explorednum = 0
+
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, reached, other = forward_frontier, forward, backward
+            waiting = len(backward_frontier)
+        else:
+            frontier, reached, other = backward_frontier, backward, forward
+            waiting = len(forward_frontier)
+
+        next_frontier = []
+        for i, person_id in enumerate(frontier):
+            explorednum += 1
+            if stats is not None:
+                stats.expand(person_id, len(frontier) - i
+                             + len(next_frontier) + waiting)
+            for movie_id, neighbor_id in neighbors(person_id):
+                if neighbor_id in reached:
+                    if stats is not None:
+                        stats.duplicates += 1
+                    continue
+                reached[neighbor_id] = (movie_id, person_id)
+                if neighbor_id in other:
+                    path = join_paths(forward, backward, neighbor_id)
+                    return path, explorednum
+                next_frontier.append(neighbor_id)
+
+        if frontier is forward_frontier:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None, explorednum
+
+
+def breadth_first_tree(source, neighbors=None):
+    """
+    Searches outwards from the source until every connected person has
+    been reached. Returns a dict mapping each of them to the
+    (movie_id, person_id) step leading back towards the source.
+    """
+    if neighbors is None:
+        neighbors = neighbors_for_person
+
+    parents = {source: None}
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for person_id in frontier:
+            for movie_id, neighbor_id in neighbors(person_id):
+                if neighbor_id not in parents:
+                    parents[neighbor_id] = (movie_id, person_id)
+                    next_frontier.append(neighbor_id)
+        frontier = next_frontier
+    return parents
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Builds the source-to-target path through the person where the
+    two frontiers of a bidirectional search met.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent_id = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, child_id = backward[person_id]
+        path.append((movie_id, child_id))
+        person_id = child_id
+    return path
+
+
+def person_id_for_name(name, policy="prompt"):
     """
     Returns the IMDB id for a person's name,
-    resolving ambiguities as needed.
+    resolving ambiguities according to policy:
+
+    "prompt" lists the candidates, or close matches for an unknown
+    name, and asks which one was intended on stdin.
+    "popular" picks the candidate who starred in the most movies.
+    "strict" returns None unless exactly one person has the name.
     """
-    person_ids = list(names.get(name.lower(), set()))
-    if len(person_ids) == 0:
-        return None
-    elif len(person_ids) > 1:
-        print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
+    if policy not in POLICIES:
+        raise ValueError(f"unknown policy {policy}")
+    person_ids = person_ids_for_name(name)
+    if len(person_ids) == 1:
+        return person_ids[0]
+    elif policy == "popular" and person_ids:
+        return max(sorted(person_ids), key=movie_count)
+    elif policy != "prompt":
         return None
+
+    if len(person_ids) == 0:
+        person_ids = [person_id for _, ids in suggestions(name)
+                      for person_id in ids]
+        if len(person_ids) == 0:
+            return None
+        print(f"No exact match for '{name}'. Did you mean:")
     else:
-        return person_ids[0]
+        print(f"Which '{name}'?")
+    for person_id in person_ids:
+        name = person_name(person_id)
+        birth = person_birth(person_id)
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def person_ids_for_name(name):
+    """Returns the IMDB ids of every person with exactly this name."""
+    if graph is None:
+        return list(names.get(name.lower(), set()))
+    return [graph.person_ids[person] for person in graph.people_for_name(name)]
+
+
+def get_name_index():
+    """Returns the name index, building it on first use."""
+    global name_index
+    if name_index is None:
+        if graph is None:
+            person_ids = list(people)
+            name_index = NameIndex(
+                [people[person_id]["name"] for person_id in person_ids],
+                person_ids
+            )
+        else:
+            name_index = NameIndex(graph.person_names, graph.person_ids)
+    return name_index
+
+
+def suggestions(name, limit=5):
+    """
+    Returns up to limit ranked (name, person_ids) candidates for a name
+    that may be misspelled or only the start of a name.
+    """
+    return get_name_index().lookup(name, limit=limit)
 
 
 def neighbors_for_person(person_id):
@@ -154,6 +444,12 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return set(
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in graph.neighbors(graph.person_index(person_id))
+        )
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -162,5 +458,33 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def person_name(person_id):
+    """Returns the name of a person."""
+    if graph is None:
+        return people[person_id]["name"]
+    return graph.person_names[graph.person_index(person_id)]
+
+
+def person_birth(person_id):
+    """Returns the birth year of a person."""
+    if graph is None:
+        return people[person_id]["birth"]
+    return graph.person_births[graph.person_index(person_id)]
+
+
+def movie_count(person_id):
+    """Returns the number of movies a person starred in."""
+    if graph is None:
+        return len(people[person_id]["movies"])
+    return len(graph.movies_for_person(graph.person_index(person_id)))
+
+
+def movie_title(movie_id):
+    """Returns the title of a movie."""
+    if graph is None:
+        return movies[movie_id]["title"]
+    return graph.movie_titles[graph.movie_index(movie_id)]
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,207 @@
+import csv
+
+import numpy as np
+
+
+class Graph():
+    """
+    Compact person–movie bipartite graph.
+
+    People and movies are interned to dense integers in file order, and
+    the edges are stored twice as CSR arrays: `person_indptr` and
+    `person_indices` list the movies of each person, `movie_indptr` and
+    `movie_indices` list the stars of each movie.
+
+    The lookups only need a `get(key, default)` method, so they can be
+    plain dicts or the sorted indexes of a memory-mapped snapshot.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_indptr, person_indices, movie_indptr, movie_indices,
+                 person_lookup=None, movie_lookup=None, names=None):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_indptr = person_indptr
+        self.person_indices = person_indices
+        self.movie_indptr = movie_indptr
+        self.movie_indices = movie_indices
+
+        # Maps IMDB ids back to their dense integer indices
+        if person_lookup is None:
+            person_lookup = {
+                person_id: i for i, person_id in enumerate(person_ids)
+            }
+        if movie_lookup is None:
+            movie_lookup = {
+                movie_id: i for i, movie_id in enumerate(movie_ids)
+            }
+        self.person_lookup = person_lookup
+        self.movie_lookup = movie_lookup
+
+        # Maps lowercase names to a list of person indices
+        if names is None:
+            names = {}
+            for i, name in enumerate(person_names):
+                names.setdefault(name.lower(), []).append(i)
+        self.names = names
+
+    def person_count(self):
+        return len(self.person_indptr) - 1
+
+    def movie_count(self):
+        return len(self.movie_indptr) - 1
+
+    def person_index(self, person_id):
+        """Returns the dense index of an IMDB person id, or None."""
+        return self.person_lookup.get(person_id)
+
+    def movie_index(self, movie_id):
+        """Returns the dense index of an IMDB movie id, or None."""
+        return self.movie_lookup.get(movie_id)
+
+    def people_for_name(self, name):
+        """Returns the indices of every person with the given name."""
+        return self.names.get(name.lower(), [])
+
+    def movies_for_person(self, person):
+        """Returns the movie indices a person starred in."""
+        start, end = self.person_indptr[person], self.person_indptr[person + 1]
+        return self.person_indices[start:end]
+
+    def stars_for_movie(self, movie):
+        """Returns the person indices who starred in a movie."""
+        start, end = self.movie_indptr[movie], self.movie_indptr[movie + 1]
+        return self.movie_indices[start:end]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people
+        who starred with a given person.
+        """
+        for movie in self.movies_for_person(person).tolist():
+            for star in self.stars_for_movie(movie).tolist():
+                yield movie, star
+
+    def search_tree(self, source, targets=None):
+        """
+        Breadth-first search from source that stops once every person in
+        targets has been reached, or runs to exhaustion if targets is None.
+
+        Returns a dict mapping each reached person to the (movie, person)
+        step leading back towards the source, with the source mapped
+        to None. Each movie's stars are scanned only once.
+        """
+        person_indptr, person_indices = self.person_indptr, self.person_indices
+        movie_indptr, movie_indices = self.movie_indptr, self.movie_indices
+
+        parents = {source: None}
+        remaining = None if targets is None else set(targets) - {source}
+        expanded_movies = set()
+        frontier = [source]
+        while frontier and (remaining is None or remaining):
+            next_frontier = []
+            for person in frontier:
+                start, end = person_indptr[person], person_indptr[person + 1]
+                for movie in person_indices[start:end].tolist():
+                    if movie in expanded_movies:
+                        continue
+                    expanded_movies.add(movie)
+                    start, end = movie_indptr[movie], movie_indptr[movie + 1]
+                    for star in movie_indices[start:end].tolist():
+                        if star not in parents:
+                            parents[star] = (movie, person)
+                            next_frontier.append(star)
+                            if remaining is not None:
+                                remaining.discard(star)
+            frontier = next_frontier
+        return parents
+
+    def nbytes(self):
+        """Returns the size of the CSR arrays in bytes."""
+        return (self.person_indptr.nbytes + self.person_indices.nbytes
+                + self.movie_indptr.nbytes + self.movie_indices.nbytes)
+
+
+def tree_path(parents, target):
+    """
+    Returns the (movie, person) path from the root of a search tree
+    to target, or None if the tree did not reach target.
+    """
+    if target not in parents:
+        return None
+    path = []
+    while parents[target] is not None:
+        movie, parent = parents[target]
+        path.append((movie, target))
+        target = parent
+    path.reverse()
+    return path
+
+
+def build_csr(rows, columns, count):
+    """
+    Builds CSR (indptr, indices) arrays for `count` rows from parallel
+    arrays of row and column indices that are already sorted by row.
+    """
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=count), out=indptr[1:])
+    return indptr, columns.astype(np.int32)
+
+
+def load_graph(directory):
+    """
+    Load data from CSV files into a compact Graph.
+    """
+    person_ids, person_names, person_births = [], [], []
+    person_lookup = {}
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            person_lookup[row["id"]] = len(person_ids)
+            person_ids.append(row["id"])
+            person_names.append(row["name"])
+            person_births.append(row["birth"])
+
+    movie_ids, movie_titles, movie_years = [], [], []
+    movie_lookup = {}
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            movie_lookup[row["id"]] = len(movie_ids)
+            movie_ids.append(row["id"])
+            movie_titles.append(row["title"])
+            movie_years.append(row["year"])
+
+    # Collect edges as one int64 key per (person, movie) pair
+    movie_count = len(movie_ids)
+    keys = []
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            person = person_lookup.get(row["person_id"])
+            movie = movie_lookup.get(row["movie_id"])
+            if person is not None and movie is not None:
+                keys.append(person * movie_count + movie)
+
+    # Sorting the keys orders edges by person and drops duplicate rows
+    keys = np.unique(np.array(keys, dtype=np.int64))
+    people = keys // max(movie_count, 1)
+    movies = keys % max(movie_count, 1)
+
+    person_indptr, person_indices = build_csr(
+        people, movies, len(person_ids)
+    )
+    order = np.argsort(movies, kind="stable")
+    movie_indptr, movie_indices = build_csr(
+        movies[order], people[order], movie_count
+    )
+
+    return Graph(person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_indptr, person_indices, movie_indptr, movie_indices,
+                 person_lookup, movie_lookup)
@@ -0,0 +1,171 @@
+import bisect
+
+import numpy as np
+
+# Length of the character n-grams used to find typo candidates
+GRAM = 3
+
+# Marks the start and end of a name so short names still have grams
+PADDING = "\0" * (GRAM - 1)
+
+
+def grams(key):
+    """Returns the set of padded character n-grams of a lowercase name."""
+    padded = PADDING + key + PADDING
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between a and b,
+    or limit + 1 as soon as it is known to exceed limit.
+
+    Only the band of cells within limit of the diagonal is filled in,
+    since every cell outside it already exceeds limit.
+    """
+    over = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return over
+    n = len(b)
+    previous = [j if j <= limit else over for j in range(n + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        current = [over] * (n + 1)
+        if i <= limit:
+            current[0] = i
+        best = current[0]
+        for j in range(max(1, i - limit), min(n, i + limit) + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost if cost < over else over
+            if cost < best:
+                best = cost
+        if best > limit:
+            return over
+        previous = current
+    return previous[n]
+
+
+class NameIndex():
+    """
+    Ranked name lookup over a list of names and their parallel ids.
+
+    Exact and prefix lookups binary-search the sorted lowercase names.
+    Typo-tolerant lookups gather candidates from an n-gram index and
+    check them with a bounded edit distance.
+    """
+
+    def __init__(self, names, ids):
+        groups = {}
+        for name, value in zip(names, ids):
+            entry = groups.setdefault(name.lower(), (name, []))
+            entry[1].append(value)
+
+        # Sorted lowercase keys, with the display name and ids of each
+        self.keys = sorted(groups)
+        self.entries = [groups[key] for key in self.keys]
+
+        # Built on the first fuzzy lookup, mapping n-grams to sorted
+        # arrays of key indices
+        self.postings = None
+        self.lengths = None
+
+    def exact(self, name):
+        """Returns the ids of every person with exactly this name."""
+        key = name.lower()
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return list(self.entries[i][1])
+        return []
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to limit (name, ids) pairs for names starting with
+        prefix, in alphabetical order, so an exact match comes first.
+        """
+        key = prefix.lower()
+        start = bisect.bisect_left(self.keys, key)
+        end = min(start + limit, len(self.keys))
+        return [self.entries[i] for i in range(start, end)
+                if self.keys[i].startswith(key)]
+
+    def build_postings(self):
+        postings = {}
+        for i, key in enumerate(self.keys):
+            for gram in grams(key):
+                postings.setdefault(gram, []).append(i)
+        self.postings = {
+            gram: np.array(keys, dtype=np.int32)
+            for gram, keys in postings.items()
+        }
+        self.lengths = np.array([len(key) for key in self.keys],
+                                dtype=np.int32)
+
+    def fuzzy(self, name, max_distance=2, limit=10):
+        """
+        Returns up to limit (name, ids, distance) triples for names
+        within max_distance edits, closest first.
+
+        One edit changes at most GRAM of a name's n-grams, so a match
+        within k edits shares all but at most k * GRAM of the query's
+        n-grams. Candidates therefore come from the k * GRAM + 1 rarest
+        ones, and are counted against the rest before any edit distance
+        is computed. The distance is lowered for short queries so that
+        the filter always applies.
+        """
+        if self.postings is None:
+            self.build_postings()
+        key = name.lower()
+        query = grams(key)
+        distance = max_distance
+        while distance > 0 and len(query) <= distance * GRAM:
+            distance -= 1
+
+        empty = np.zeros(0, dtype=np.int32)
+        lists = sorted((self.postings.get(gram, empty) for gram in query),
+                       key=len)
+        cutoff = distance * GRAM + 1
+        needed = len(query) - distance * GRAM
+        candidates, shared = np.unique(np.concatenate(lists[:cutoff]),
+                                       return_counts=True)
+        keep = np.abs(self.lengths[candidates] - len(key)) <= distance
+        candidates, shared = candidates[keep], shared[keep]
+
+        # Count the rest of the shared n-grams, rarest first, dropping
+        # candidates that can no longer reach the needed count
+        for remaining, keys in zip(range(len(lists) - cutoff - 1, -1, -1),
+                                   lists[cutoff:]):
+            positions = np.searchsorted(keys, candidates)
+            positions[positions == len(keys)] = 0
+            shared += keys[positions] == candidates
+            keep = shared + remaining >= needed
+            candidates, shared = candidates[keep], shared[keep]
+
+        matches = []
+        for i in candidates.tolist():
+            found = edit_distance(key, self.keys[i], distance)
+            if found <= distance:
+                matches.append((found, abs(len(self.keys[i]) - len(key)),
+                                self.keys[i], i))
+        matches.sort()
+        return [self.entries[i] + (found,)
+                for found, _, _, i in matches[:limit]]
+
+    def lookup(self, name, limit=10, max_distance=2):
+        """
+        Returns up to limit ranked (name, ids) candidates for a query:
+        the exact match first, then names it is a prefix of, then
+        names within max_distance edits.
+        """
+        results = []
+        seen = set()
+        for entry in (self.prefix(name, limit)
+                      + [entry[:2] for entry in
+                         self.fuzzy(name, max_distance, limit)]):
+            if entry[0].lower() not in seen:
+                seen.add(entry[0].lower())
+                results.append(entry)
+        return results[:limit]
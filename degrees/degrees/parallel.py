@@ -0,0 +1,141 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from degrees import bidirectional_search
+from graph import Graph, tree_path
+
+ARRAYS = ["person_indptr", "person_indices", "movie_indptr", "movie_indices"]
+
+# Cost of one search tree per person in the graph, counted in people
+# expanded by a bidirectional search, which take about 10us each against
+# about 4us per person a tree reaches. A source's targets switch from
+# bidirectional searches to one tree once the searches left are expected
+# to cost more than the tree.
+TREE_COST = 0.4
+
+# Graph attached to shared memory inside each worker process
+worker_graph = None
+worker_blocks = []
+
+
+class SharedGraph():
+    """
+    Copies the CSR arrays of a Graph into shared memory blocks that
+    worker processes attach to by name instead of receiving a pickle.
+    """
+
+    def __init__(self, graph):
+        self.blocks = []
+        self.specs = []
+        for name in ARRAYS:
+            array = getattr(graph, name)
+            block = shared_memory.SharedMemory(
+                create=True, size=max(array.nbytes, 1)
+            )
+            shared = np.ndarray(array.shape, dtype=array.dtype,
+                                buffer=block.buf)
+            shared[:] = array
+            self.blocks.append(block)
+            self.specs.append((block.name, array.dtype.str, array.shape))
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(specs):
+    """Worker initializer that maps the shared CSR arrays into a Graph."""
+    global worker_graph
+    arrays = []
+    for name, dtype, shape in specs:
+        block = shared_memory.SharedMemory(name=name)
+        worker_blocks.append(block)
+        arrays.append(np.ndarray(shape, dtype=np.dtype(dtype),
+                                 buffer=block.buf))
+    worker_graph = Graph([], [], [], [], [], [], *arrays,
+                         person_lookup={}, movie_lookup={}, names={})
+
+
+def answer_group(source, targets, tree_cost):
+    """
+    Returns the index path from source to each of targets,
+    or None where unreachable.
+
+    Targets are answered by bidirectional searches until the people
+    they expanded so far, scaled to the targets left, cost more than a
+    search tree by tree_cost, and the rest from one search tree. A
+    tree_cost of 0 always uses the tree.
+    """
+    budget = tree_cost * (len(worker_graph.person_indptr) - 1)
+    paths = []
+    explored = 0
+    for position, target in enumerate(targets):
+        remaining = targets[position:]
+        if not budget or len(remaining) * explored > budget * position:
+            parents = worker_graph.search_tree(source, remaining)
+            paths.extend(tree_path(parents, other) for other in remaining)
+            break
+        path, count = bidirectional_search(source, target,
+                                           neighbors=worker_graph.neighbors)
+        paths.append(path)
+        explored += count
+    return paths
+
+
+def group_by_source(pairs):
+    """
+    Groups (source, target) pairs by source, returning a dict from
+    each source to its list of (position, target) entries.
+    """
+    groups = {}
+    for position, (source, target) in enumerate(pairs):
+        groups.setdefault(source, []).append((position, target))
+    return groups
+
+
+def parallel_shortest_paths(graph, pairs, processes=None,
+                            tree_cost=TREE_COST):
+    """
+    Returns the shortest path for each (source, target) pair of IMDB
+    person ids, in the same (movie_id, person_id) format and order as
+    shortest_path would give them.
+
+    Each source's targets are answered by bidirectional searches or,
+    once those look more costly than a search tree by tree_cost, from
+    one tree, as in answer_group. The sources are spread over
+    `processes` workers that share the graph.
+    """
+    indexed = [(graph.person_index(source), graph.person_index(target))
+               for source, target in pairs]
+    groups = group_by_source(indexed)
+    results = [None] * len(pairs)
+
+    with SharedGraph(graph) as shared:
+        with ProcessPoolExecutor(max_workers=processes, initializer=attach,
+                                 initargs=(shared.specs,)) as executor:
+            futures = {
+                source: executor.submit(
+                    answer_group, source, [target for _, target in entries],
+                    tree_cost
+                )
+                for source, entries in groups.items()
+            }
+            for source, future in futures.items():
+                for (position, _), path in zip(groups[source],
+                                               future.result()):
+                    if path is not None:
+                        path = [(graph.movie_ids[movie],
+                                 graph.person_ids[person])
+                                for movie, person in path]
+                    results[position] = path
+    return results
@@ -0,0 +1,251 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+from cache import SearchCache
+
+# Shared cache of paths and search trees, enabled with --cache-mb
+cache = None
+
+
+def resolve_name(name, policy="strict"):
+    """
+    Returns a (person_id, error) pair for a name without prompting.
+    Unknown names are reported with close matches, and names shared by
+    several people either with their ids or, under the "popular"
+    policy, resolved to the one with the most movies.
+    """
+    person_id = degrees.person_id_for_name(name, policy=policy)
+    if person_id is not None:
+        return person_id, None
+
+    person_ids = sorted(degrees.person_ids_for_name(name))
+    if len(person_ids) > 1:
+        return None, f"ambiguous name: {name} ({', '.join(person_ids)})"
+    error = f"person not found: {name}"
+    matches = [match for match, _ in degrees.suggestions(name)]
+    if matches:
+        error += f" (did you mean: {'; '.join(matches)})"
+    return None, error
+
+
+def answer(source_name, target_name, bidirectional=True, policy="strict"):
+    """
+    Answers one query as a JSON-serializable dict, with either
+    the degrees and path between two people or an error message.
+    """
+    result = {"source": source_name, "target": target_name}
+    source, error = resolve_name(source_name, policy)
+    if error is None:
+        target, error = resolve_name(target_name, policy)
+    if error is not None:
+        result["error"] = error
+        return result
+
+    path = degrees.shortest_path(source, target, bidirectional=bidirectional,
+                                 cache=cache)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+        return result
+    result["degrees"] = len(path)
+    result["path"] = [
+        {
+            "movie_id": movie_id,
+            "movie": degrees.movie_title(movie_id),
+            "person_id": person_id,
+            "person": degrees.person_name(person_id)
+        }
+        for movie_id, person_id in path
+    ]
+    return result
+
+
+def run_batch(lines, out, bidirectional=True, policy="strict"):
+    """
+    Answers one query per line of tab-separated source and target names,
+    writing each result to out as a JSON line as soon as it is found.
+
+    Returns the number of queries answered and the seconds taken.
+    """
+    count = 0
+    start = time.perf_counter()
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        fields = line.split("\t")
+        if len(fields) != 2:
+            result = {"line": line, "error": "expected source<TAB>target"}
+        else:
+            result = answer(fields[0].strip(), fields[1].strip(),
+                            bidirectional=bidirectional, policy=policy)
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        count += 1
+    return count, time.perf_counter() - start
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /path?source=NAME&target=NAME and GET /stats
+    from the graph already loaded into the degrees module.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    # Headers and body are written separately, so without this each
+    # keep-alive response waits on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/path":
+            query = parse_qs(url.query)
+            if "source" not in query or "target" not in query:
+                self.send_json(400, {"error": "source and target required"})
+                return
+            start = time.perf_counter()
+            if cache is None:
+                result = answer(query["source"][0], query["target"][0],
+                                bidirectional=self.server.bidirectional,
+                                policy=self.server.policy)
+            else:
+                # The cache is not thread-safe, so queries take turns
+                with self.server.cache_lock:
+                    result = answer(query["source"][0], query["target"][0],
+                                    bidirectional=self.server.bidirectional,
+                                    policy=self.server.policy)
+            self.server.record(time.perf_counter() - start)
+            self.send_json(200, result)
+        elif url.path == "/stats":
+            stats = self.server.stats()
+            if cache is not None:
+                with self.server.cache_lock:
+                    stats["cache"] = cache.stats()
+            self.send_json(200, stats)
+        else:
+            self.send_json(404, {"error": f"unknown path {url.path}"})
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QueryServer(ThreadingHTTPServer):
+    """HTTP server that keeps query counts for throughput reporting."""
+
+    daemon_threads = True
+
+    def __init__(self, address, bidirectional=True, policy="strict"):
+        super().__init__(address, QueryHandler)
+        self.bidirectional = bidirectional
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.cache_lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.busy = 0.0
+
+    def record(self, seconds):
+        with self.lock:
+            self.queries += 1
+            self.busy += seconds
+
+    def stats(self):
+        with self.lock:
+            uptime = time.perf_counter() - self.started
+            return {
+                "queries": self.queries,
+                "uptime": uptime,
+                "qps": self.queries / uptime if uptime else 0.0,
+                "search_qps": self.queries / self.busy if self.busy else 0.0
+            }
+
+
+def serve(host="127.0.0.1", port=8050, bidirectional=True, policy="strict"):
+    """Serves queries until interrupted, then reports throughput."""
+    server = QueryServer((host, port), bidirectional=bidirectional,
+                         policy=policy)
+    print(f"Serving on http://{host}:{server.server_port}/path",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = server.stats()
+        print(f"{stats['queries']} queries, {stats['qps']:.1f} queries/s",
+              file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--batch", metavar="FILE", nargs="?", const="-",
+                      help="answer tab-separated name pairs from FILE "
+                           "(default stdin) as JSON lines")
+    mode.add_argument("--serve", action="store_true",
+                      help="answer HTTP queries until interrupted")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--snapshot", action="store_true")
+    parser.add_argument("--one-sided", action="store_true",
+                        help="use the one-sided breadth-first search")
+    parser.add_argument("--cache-mb", type=float, default=0,
+                        help="cache paths and popular people's search "
+                             "trees in this many megabytes")
+    parser.add_argument("--ambiguous", choices=["strict", "popular"],
+                        default="strict",
+                        help="report shared names as errors, or pick the "
+                             "person with the most movies")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, compact=args.compact,
+                      snapshot=args.snapshot)
+    print("Data loaded.", file=sys.stderr)
+
+    global cache
+    if args.cache_mb > 0:
+        cache = SearchCache(memory_budget=int(args.cache_mb * 2**20))
+
+    bidirectional = not args.one_sided
+    if args.serve:
+        serve(args.host, args.port, bidirectional, args.ambiguous)
+    elif args.batch == "-":
+        count, seconds = run_batch(sys.stdin, sys.stdout, bidirectional,
+                                   args.ambiguous)
+        report(count, seconds)
+    else:
+        with open(args.batch, encoding="utf-8") as f:
+            count, seconds = run_batch(f, sys.stdout, bidirectional,
+                                       args.ambiguous)
+        report(count, seconds)
+
+
+def report(count, seconds):
+    qps = count / seconds if seconds else 0.0
+    print(f"{count} queries in {seconds:.2f}s, {qps:.1f} queries/s",
+          file=sys.stderr)
+    if cache is not None:
+        print(f"Cache: {json.dumps(cache.stats())}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from graph import Graph, load_graph
+
+MAGIC = b"DEGSNAP\0"
+VERSION = 1
+FILENAME = "degrees.snapshot"
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Arrays are written at offsets that are a multiple of this many bytes
+ALIGNMENT = 64
+
+# Magic, format version and header length
+PREAMBLE = struct.Struct("<8sII")
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 blob
+    and an array of offsets into it.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+        # Memoryviews index to plain ints and bytes, which is much
+        # faster than going through NumPy scalars on every lookup
+        self.data = memoryview(blob)
+        self.bounds = memoryview(offsets)
+        self.count = len(offsets) - 1
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self.count:
+            raise IndexError("string table index out of range")
+        return str(self.data[self.bounds[i]:self.bounds[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SortedLookup():
+    """
+    Maps strings to indices by binary search over `order`,
+    a permutation of `strings` sorted by `key`.
+    """
+
+    def __init__(self, strings, order, key=None):
+        self.strings = strings
+        self.order = order
+        self.positions = memoryview(order)
+        self.key = key
+
+    def sort_key(self, i):
+        string = self.strings[i]
+        return string if self.key is None else self.key(string)
+
+    def get_all(self, value):
+        """Returns the indices of every string equal to value."""
+        start = bisect.bisect_left(self.positions, value, key=self.sort_key)
+        end = bisect.bisect_right(self.positions, value, lo=start,
+                                  key=self.sort_key)
+        return self.order[start:end].tolist()
+
+    def get(self, value, default=None):
+        matches = self.get_all(value)
+        return matches[0] if matches else default
+
+
+class SortedNames(SortedLookup):
+    """Lowercase name index with the same get() shape as a dict of lists."""
+
+    def __init__(self, names, order):
+        super().__init__(names, order, key=str.lower)
+
+    def get(self, value, default=None):
+        return self.get_all(value) or default
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def fingerprint(directory):
+    """
+    Returns the size and modification time of every source CSV,
+    which a snapshot must match to still be considered current.
+    """
+    sources = {}
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        sources[filename] = [stat.st_size, stat.st_mtime_ns]
+    return sources
+
+
+def sorted_order(strings, key=None):
+    """Returns the permutation that sorts strings, as an int32 array."""
+    if key is None:
+        order = sorted(range(len(strings)), key=strings.__getitem__)
+    else:
+        order = sorted(range(len(strings)), key=lambda i: key(strings[i]))
+    return np.array(order, dtype=np.int32)
+
+
+def compile_snapshot(directory, path=None):
+    """
+    Parses the CSV files in directory and writes the graph, string
+    tables and lookup indexes to a binary snapshot. Returns its path.
+    """
+    if path is None:
+        path = snapshot_path(directory)
+    sources = fingerprint(directory)
+    graph = load_graph(directory)
+
+    arrays = {
+        "person_indptr": graph.person_indptr,
+        "person_indices": graph.person_indices,
+        "movie_indptr": graph.movie_indptr,
+        "movie_indices": graph.movie_indices,
+        "person_id_order": sorted_order(graph.person_ids),
+        "movie_id_order": sorted_order(graph.movie_ids),
+        "name_order": sorted_order(graph.person_names, key=str.lower)
+    }
+    tables = ["person_ids", "person_names", "person_births",
+              "movie_ids", "movie_titles", "movie_years"]
+    for table in tables:
+        strings = StringTable.from_strings(getattr(graph, table))
+        arrays[f"{table}_blob"] = strings.blob
+        arrays[f"{table}_offsets"] = strings.offsets
+
+    # Lay the arrays out after the header, each aligned for mmap access
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {
+            "dtype": array.dtype.str,
+            "length": len(array),
+            "offset": offset
+        }
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({"sources": sources, "arrays": layout}).encode()
+    start = -(-(PREAMBLE.size + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    # Write to a temporary file so readers never see a partial snapshot
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(temporary, path)
+    return path
+
+
+def read_header(f):
+    """
+    Returns the header of an open snapshot and the offset its arrays
+    start at, or None if the file is not a snapshot of this version.
+    """
+    preamble = f.read(PREAMBLE.size)
+    if len(preamble) != PREAMBLE.size:
+        return None
+    magic, version, length = PREAMBLE.unpack(preamble)
+    if magic != MAGIC or version != VERSION:
+        return None
+    header = json.loads(f.read(length))
+    start = -(-(PREAMBLE.size + length) // ALIGNMENT) * ALIGNMENT
+    return header, start
+
+
+def load_snapshot(directory, path=None):
+    """
+    Memory-maps a snapshot into a Graph.
+
+    Returns None if there is no snapshot, it was written by another
+    format version, or the source CSVs changed since it was compiled.
+    """
+    if path is None:
+        path = snapshot_path(directory)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        header = read_header(f)
+        if header is None:
+            return None
+        header, start = header
+        if header["sources"] != fingerprint(directory):
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        arrays[name] = np.frombuffer(
+            buffer, dtype=np.dtype(entry["dtype"]), count=entry["length"],
+            offset=start + entry["offset"]
+        )
+    tables = {}
+    for table in ["person_ids", "person_names", "person_births",
+                  "movie_ids", "movie_titles", "movie_years"]:
+        tables[table] = StringTable(arrays[f"{table}_blob"],
+                                    arrays[f"{table}_offsets"])
+
+    return Graph(
+        tables["person_ids"], tables["person_names"], tables["person_births"],
+        tables["movie_ids"], tables["movie_titles"], tables["movie_years"],
+        arrays["person_indptr"], arrays["person_indices"],
+        arrays["movie_indptr"], arrays["movie_indices"],
+        person_lookup=SortedLookup(tables["person_ids"],
+                                   arrays["person_id_order"]),
+        movie_lookup=SortedLookup(tables["movie_ids"],
+                                  arrays["movie_id_order"]),
+        names=SortedNames(tables["person_names"], arrays["name_order"])
+    )
+
+
+def load_or_compile(directory):
+    """
+    Loads the snapshot for directory, compiling it first if it is
+    missing or out of date.
+    """
+    graph = load_snapshot(directory)
+    if graph is None:
+        compile_snapshot(directory)
+        graph = load_snapshot(directory)
+    return graph
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python snapshot.py directory")
+    path = compile_snapshot(sys.argv[1])
+    print(f"Wrote {path} ({os.path.getsize(path) / 2**20:.1f} MB).")
+
+
+if __name__ == "__main__":
+    main()
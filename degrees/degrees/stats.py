@@ -0,0 +1,60 @@
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class SearchStats():
+    """
+    Counters and per-phase timings collected by the searches in degrees.
+
+    One object can be passed to many searches to aggregate them. Each
+    function in on_expand is called as on_expand(person, frontier_size)
+    whenever a person's neighbors are expanded.
+    """
+
+    def __init__(self, on_expand=None):
+        self.searches = 0
+        self.found = 0
+        self.expanded = 0
+        self.edges = 0
+        self.duplicates = 0
+        self.peak_frontier = 0
+        self.timings = Counter()
+        self.on_expand = list(on_expand or [])
+
+    def expand(self, person, frontier_size):
+        """Records the expansion of person with the frontier at a size."""
+        self.expanded += 1
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+        for callback in self.on_expand:
+            callback(person, frontier_size)
+
+    @contextmanager
+    def timer(self, phase):
+        """Adds the time spent inside the block to phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] += time.perf_counter() - start
+
+    def as_dict(self, **metadata):
+        """
+        Returns the counters and timings as a JSON-serializable dict,
+        along with any metadata such as the dataset they came from.
+        """
+        return {
+            **metadata,
+            "searches": self.searches,
+            "found": self.found,
+            "expanded": self.expanded,
+            "edges_scanned": self.edges,
+            "duplicates_suppressed": self.duplicates,
+            "peak_frontier": self.peak_frontier,
+            "seconds": dict(self.timings)
+        }
+
+    def to_json(self, **metadata):
+        return json.dumps(self.as_dict(**metadata), indent=2)
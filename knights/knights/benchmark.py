@@ -0,0 +1,365 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from generator import generate_puzzle
+from hashcons import HashCons
+from logic import *
+from parallel import parallel_model_check
+from serialize import dumps, loads
+
+
+def scaling_benchmark(sizes, backends, table_limit, seed):
+    """
+    Times answering every symbol of generated puzzles with each backend,
+    skipping the truth-table backends once the puzzle has more than
+    table_limit symbols.
+    """
+    print(f"{'backend':<10} {'symbols':>8} {'entailed':>9} {'seconds':>10}")
+    for size in sizes:
+        knowledge, symbols, _ = generate_puzzle(size, size, seed + size)
+        for backend in backends:
+            if backend != "sat" and len(symbols) > table_limit:
+                continue
+            start = time.perf_counter()
+            entailed = sum(model_check(knowledge, symbol, backend=backend)
+                           for symbol in symbols)
+            elapsed = time.perf_counter() - start
+            print(f"{backend:<10} {len(symbols):>8} {entailed:>9} "
+                  f"{elapsed:>10.3f}")
+
+
+def batch_benchmark(sizes, seed):
+    """
+    Compares answering every symbol of generated puzzles with separate
+    model_check calls against one KnowledgeBase query, and checks that
+    adding sentences between queries gives the same answers.
+    """
+    # A symbol only in a clause already satisfied by an earlier fact must
+    # still be part of the models a KnowledgeBase keeps
+    a, b = Symbol("a"), Symbol("b")
+    kb = KnowledgeBase(a)
+    kb.add(Or(a, b))
+    if kb.query([Not(a), b, a]) != [False, False, True]:
+        sys.exit("KnowledgeBase results differ after adding a clause")
+
+    print(f"{'symbols':>8} {'separate s':>11} {'batch s':>8} {'solves':>7}")
+    for size in sizes:
+        knowledge, symbols, _ = generate_puzzle(size, size, seed + size)
+        start = time.perf_counter()
+        expected = [model_check(knowledge, symbol) for symbol in symbols]
+        separate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        kb = KnowledgeBase(knowledge)
+        solves = kb.solver.solves
+        if kb.query(symbols) != expected:
+            sys.exit("Batch results differ from model_check")
+        batch = time.perf_counter() - start
+
+        # Sentences added after queries give the same answers, including
+        # ones already satisfied by the entailed facts added before them
+        half = len(knowledge.conjuncts) // 2
+        later = KnowledgeBase(*knowledge.conjuncts[:half])
+        later.query(symbols)
+        for symbol, entailed in zip(symbols, expected):
+            if entailed:
+                later.add(symbol)
+        for conjunct in knowledge.conjuncts[half:]:
+            later.add(conjunct)
+        if later.query(symbols) != expected:
+            sys.exit("Results after adding sentences differ from model_check")
+        print(f"{len(symbols):>8} {separate:>11.3f} {batch:>8.3f} "
+              f"{kb.solver.solves - solves:>7}")
+
+
+def clause_literals(clauses, symbols, width, rng):
+    """Returns random clauses as lists of (symbol name, positive) pairs."""
+    return [[(f"s{rng.randrange(symbols)}", rng.random() < 0.5)
+             for _ in range(width)]
+            for _ in range(clauses)]
+
+
+def build_plain(literals):
+    """Builds a knowledge base with new objects for every occurrence."""
+    return And(*[
+        Or(*[Symbol(name) if positive else Not(Symbol(name))
+             for name, positive in clause])
+        for clause in literals
+    ])
+
+
+def build_shared(literals):
+    """Builds a knowledge base where identical sentences are shared."""
+    cons = HashCons()
+    return cons.make(And, *[
+        cons.make(Or, *[cons.symbol(name) if positive
+                        else cons.make(Not, cons.symbol(name))
+                        for name, positive in clause])
+        for clause in literals
+    ])
+
+
+def count_nodes(sentence):
+    """Returns the number of distinct sentence objects in a tree."""
+    seen = set()
+    stack = [sentence]
+    while stack:
+        current = stack.pop()
+        if id(current) not in seen:
+            seen.add(id(current))
+            stack.extend(current.operands())
+    return len(seen)
+
+
+def memory_benchmark(clauses, symbols, width, seed):
+    """
+    Compares building a knowledge base of random clauses from new
+    objects against hash-consed construction, reporting the objects and
+    memory each one takes and the cost of hash() and symbols() on the
+    result, computed and then called again, when only the frozen shared
+    sentences have them cached.
+    """
+    literals = clause_literals(clauses, symbols, width, random.Random(seed))
+    print(f"{'build':<8} {'objects':>9} {'MB':>8} {'build s':>8} "
+          f"{'hash s':>8} {'rehash s':>9} {'symbols s':>10} "
+          f"{'again s':>8}")
+    for name, build in [("plain", build_plain), ("shared", build_shared)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        knowledge = build(literals)
+        built = time.perf_counter() - start
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        timings = []
+        for operation in [hash, hash, Sentence.symbols, Sentence.symbols]:
+            start = time.perf_counter()
+            operation(knowledge)
+            timings.append(time.perf_counter() - start)
+        print(f"{name:<8} {count_nodes(knowledge):>9} {size / 2**20:>8.1f} "
+              f"{built:>8.3f} {timings[0]:>8.4f} {timings[1]:>9.6f} "
+              f"{timings[2]:>10.4f} {timings[3]:>8.4f}")
+        del knowledge
+
+
+def parallel_benchmark(characters, processes, split, backend, seed):
+    """
+    Times the serial and parallel checkers on every symbol of a
+    generated puzzle, reporting the speedup of each process count.
+    """
+    knowledge, symbols, _ = generate_puzzle(characters, characters, seed)
+    start = time.perf_counter()
+    expected = [model_check(knowledge, symbol, backend=backend)
+                for symbol in symbols]
+    serial = time.perf_counter() - start
+    print(f"{len(symbols)} symbols, {sum(expected)} entailed, "
+          f"serial {backend} {serial:.3f}s")
+
+    print(f"{'processes':<10} {'seconds':>10} {'speedup':>8}")
+    for count in processes:
+        start = time.perf_counter()
+        results = [parallel_model_check(knowledge, symbol, processes=count,
+                                        split=split, backend=backend)
+                   for symbol in symbols]
+        elapsed = time.perf_counter() - start
+        if results != expected:
+            sys.exit("Parallel results differ from the serial checker")
+        print(f"{count:<10} {elapsed:>10.3f} {serial / elapsed:>8.2f}")
+
+
+def deep_chain(depth):
+    """Returns a sentence nesting And and Or depth levels deep."""
+    sentence = Symbol("s")
+    for i in range(depth):
+        if i % 2:
+            sentence = And(Symbol(f"a{i}"), sentence)
+        else:
+            sentence = Or(sentence, Not(Symbol(f"o{i}")))
+    return sentence
+
+
+def serialize_benchmark(clauses, symbols, depth, seed):
+    """
+    Times writing and reading a large knowledge base and a deeply nested
+    sentence as formula text and in the binary format.
+    """
+    literals = clause_literals(clauses, symbols, 3, random.Random(seed))
+    print(f"{'sentence':<10} {'format':<8} {'bytes':>10} {'write s':>8} "
+          f"{'read s':>8}")
+    for name, sentence in [("clauses", build_plain(literals)),
+                           ("deep", deep_chain(depth))]:
+        expected = sentence.formula()
+        for format, write, read in [
+            ("text", Sentence.formula, parse),
+            ("binary", lambda s: dumps([s]), lambda data: loads(data)[0])
+        ]:
+            start = time.perf_counter()
+            data = write(sentence)
+            written = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = read(data)
+            elapsed = time.perf_counter() - start
+            if loaded.formula() != expected:
+                sys.exit(f"{format} round trip changed {name}")
+            size = len(data.encode() if format == "text" else data)
+            print(f"{name:<10} {format:<8} {size:>10} {written:>8.3f} "
+                  f"{elapsed:>8.3f}")
+
+
+def entailment_runners(processes):
+    """
+    Returns a dict from name to a function answering a list of queries
+    against a knowledge base, for every backend and mode, and whether
+    it enumerates a truth table.
+    """
+    runners = {}
+    for backend in BACKENDS:
+        runners[backend] = (
+            lambda knowledge, queries, backend=backend: [
+                model_check(knowledge, query, backend=backend)
+                for query in queries
+            ],
+            backend != "sat"
+        )
+    runners["batch"] = (
+        lambda knowledge, queries: KnowledgeBase(knowledge).query(queries),
+        False
+    )
+    runners["parallel"] = (
+        lambda knowledge, queries: [
+            parallel_model_check(knowledge, query, processes=processes)
+            for query in queries
+        ],
+        True
+    )
+    return runners
+
+
+def suite_benchmark(sizes, statements, repeats, table_limit, processes,
+                    seed, output):
+    """
+    Times every entailment backend on generated puzzles of each size,
+    answering whether each character is a knight or a knave, and writes
+    one CSV row per backend, puzzle and repetition to output.
+
+    Truth-table backends are skipped above table_limit symbols. Every
+    backend must agree, and no symbol false in the puzzle's hidden
+    solution may be entailed.
+    """
+    runners = entailment_runners(processes)
+    fields = ["backend", "characters", "statements", "symbols", "seed",
+              "repeat", "entailed", "seconds"]
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for size in sizes:
+            count = round(size * statements)
+            knowledge, symbols, solution = generate_puzzle(size, count,
+                                                           seed + size)
+            expected = None
+            for name, (run, table) in runners.items():
+                if table and len(symbols) > table_limit:
+                    continue
+                for repeat in range(repeats):
+                    start = time.perf_counter()
+                    entailed = run(knowledge, symbols)
+                    elapsed = time.perf_counter() - start
+                    if any(holds and not solution[symbol.name]
+                           for symbol, holds in zip(symbols, entailed)):
+                        sys.exit(f"{name} entailed a false symbol")
+                    if expected is None:
+                        expected = entailed
+                    elif entailed != expected:
+                        sys.exit(f"{name} disagrees with the other backends")
+                    writer.writerow({
+                        "backend": name,
+                        "characters": size,
+                        "statements": count,
+                        "symbols": len(symbols),
+                        "seed": seed + size,
+                        "repeat": repeat,
+                        "entailed": sum(entailed),
+                        "seconds": f"{elapsed:.6f}"
+                    })
+                    f.flush()
+                print(f"{name:<10} {len(symbols):>6} symbols "
+                      f"{elapsed:>10.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    scaling = subparsers.add_parser("scaling")
+    scaling.add_argument("--sizes", type=int, nargs="+",
+                         default=[3, 5, 8, 10, 50, 100, 200])
+    scaling.add_argument("--backends", nargs="+", default=list(BACKENDS),
+                         choices=list(BACKENDS))
+    scaling.add_argument("--table-limit", type=int, default=16)
+    scaling.add_argument("--seed", type=int, default=0)
+
+    suite = subparsers.add_parser("suite")
+    suite.add_argument("--sizes", type=int, nargs="+",
+                       default=[2, 4, 6, 8, 16, 32, 64, 128])
+    suite.add_argument("--statements", type=float, default=1.0,
+                       help="statements per character")
+    suite.add_argument("--repeats", type=int, default=3)
+    suite.add_argument("--table-limit", type=int, default=16)
+    suite.add_argument("--processes", type=int, default=os.cpu_count())
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--output", default="results.csv")
+
+    memory = subparsers.add_parser("memory")
+    memory.add_argument("--clauses", type=int, default=100000)
+    memory.add_argument("--symbols", type=int, default=1000)
+    memory.add_argument("--width", type=int, default=3)
+    memory.add_argument("--seed", type=int, default=0)
+
+    batch = subparsers.add_parser("batch")
+    batch.add_argument("--sizes", type=int, nargs="+",
+                       default=[10, 50, 100, 200, 500])
+    batch.add_argument("--seed", type=int, default=0)
+
+    serialization = subparsers.add_parser("serialize")
+    serialization.add_argument("--clauses", type=int, default=100000)
+    serialization.add_argument("--symbols", type=int, default=1000)
+    serialization.add_argument("--depth", type=int, default=100000)
+    serialization.add_argument("--seed", type=int, default=0)
+
+    speedup = subparsers.add_parser("parallel")
+    speedup.add_argument("--characters", type=int, default=11)
+    speedup.add_argument("--processes", type=int, nargs="+",
+                         default=list(range(1, (os.cpu_count() or 1) + 1)))
+    speedup.add_argument("--split", type=int)
+    speedup.add_argument("--backend", choices=["bits", "sat"], default="bits")
+    speedup.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.benchmark == "scaling":
+        scaling_benchmark(args.sizes, args.backends, args.table_limit,
+                          args.seed)
+    elif args.benchmark == "suite":
+        suite_benchmark(args.sizes, args.statements, args.repeats,
+                        args.table_limit, args.processes, args.seed,
+                        args.output)
+    elif args.benchmark == "memory":
+        memory_benchmark(args.clauses, args.symbols, args.width, args.seed)
+    elif args.benchmark == "batch":
+        batch_benchmark(args.sizes, args.seed)
+    elif args.benchmark == "serialize":
+        serialize_benchmark(args.clauses, args.symbols, args.depth,
+                            args.seed)
+    elif args.benchmark == "parallel":
+        parallel_benchmark(args.characters, args.processes, args.split,
+                           args.backend, args.seed)
+    else:
+        sys.exit(f"Unknown benchmark {args.benchmark}")
+
+
+if __name__ == "__main__":
+    main()
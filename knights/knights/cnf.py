@@ -0,0 +1,51 @@
+class CNF():
+    """
+    Clauses in conjunctive normal form over integer variables.
+
+    Literals follow the DIMACS convention: variable v is the literal v
+    and its negation is -v. Every symbol name gets its own variable, and
+    sentences are encoded through their encode() and require() methods.
+    """
+
+    def __init__(self):
+        self.variables = {}
+        self.count = 0
+        self.clauses = []
+        self.encoded = {}
+        self.true_literal = None
+
+    def new_variable(self):
+        """Returns a fresh variable, used for Tseitin definitions."""
+        self.count += 1
+        return self.count
+
+    def variable(self, name):
+        """Returns the variable of a symbol name, creating it if needed."""
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+        return self.variables[name]
+
+    def true(self):
+        """Returns a literal that is always true."""
+        if self.true_literal is None:
+            self.true_literal = self.new_variable()
+            self.add_clause([self.true_literal])
+        return self.true_literal
+
+    def add_clause(self, literals):
+        self.clauses.append(list(literals))
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to sentence. Each sentence object is
+        encoded once, so shared subtrees get a single definition.
+        """
+        key = id(sentence)
+        if key not in self.encoded:
+            # Keep the sentence alive so its id cannot be reused
+            self.encoded[key] = (sentence, sentence.encode(self))
+        return self.encoded[key][1]
+
+    def require(self, sentence):
+        """Adds clauses that hold exactly when sentence is true."""
+        sentence.require(self)
@@ -0,0 +1,322 @@
+import itertools
+
+import numpy as np
+
+# Models evaluated together by the NumPy checker, as a power of two
+BLOCK_BITS = 16
+
+# Model numbers are held in int64, one bit per symbol
+MAX_SYMBOLS = 62
+
+# Bit patterns of the first six symbols across the 64 models of a word,
+# where model m of a word sets symbol i to bit i of m
+WORD_BITS = 64
+WORD_SYMBOLS = 6
+PATTERNS = [sum(1 << m for m in range(WORD_BITS) if m >> i & 1)
+            for i in range(WORD_SYMBOLS)]
+ONES = (1 << WORD_BITS) - 1
+
+
+class Program():
+    """
+    Straight-line program computing one or more sentences.
+
+    Symbols are numbered by their position in self.symbols. Instruction
+    i computes register i and is a pair (operation, arguments), where
+    the arguments of a "symbol" instruction are its symbol index and of
+    every other operation are earlier registers. A sentence object that
+    appears several times in the trees is computed only once.
+    """
+
+    def __init__(self, sentences, symbols=None):
+        self.symbols = list(symbols) if symbols is not None else []
+        self.index = {name: i for i, name in enumerate(self.symbols)}
+        self.fixed = symbols is not None
+        self.instructions = []
+        self.registers = {}
+        self.outputs = [self.emit(sentence) for sentence in sentences]
+        self.function = None
+        self.releases = None
+
+    def emit(self, root):
+        """
+        Appends the instructions computing root, without recursion, and
+        returns the register holding its value.
+        """
+        registers = self.registers
+        stack = [(root, False)]
+        while stack:
+            sentence, ready = stack.pop()
+            if id(sentence) in registers:
+                continue
+            operands = sentence.operands()
+            if not ready:
+                stack.append((sentence, True))
+                stack.extend((operand, False)
+                             for operand in reversed(operands))
+                continue
+
+            if sentence.operation == "symbol":
+                arguments = (self.symbol_index(sentence.name),)
+            elif sentence.operation is None:
+                raise Exception("nothing to compile")
+            else:
+                arguments = tuple(registers[id(operand)][1]
+                                  for operand in operands)
+            self.instructions.append((sentence.operation, arguments))
+
+            # Keep the sentence alive so its id cannot be reused
+            registers[id(sentence)] = (sentence, len(self.instructions) - 1)
+        return registers[id(root)][1]
+
+    def symbol_index(self, name):
+        if name not in self.index:
+            if self.fixed:
+                raise Exception(f"variable {name} not in symbols")
+            self.index[name] = len(self.symbols)
+            self.symbols.append(name)
+        return self.index[name]
+
+    def run(self, values):
+        """
+        Interprets the instructions for one model, given as a sequence of
+        truth values indexed like self.symbols. Returns a tuple with the
+        value of each sentence.
+        """
+        results = []
+        for operation, arguments in self.instructions:
+            if operation == "symbol":
+                value = bool(values[arguments[0]])
+            elif operation == "not":
+                value = not results[arguments[0]]
+            elif operation == "and":
+                value = all(results[a] for a in arguments)
+            elif operation == "or":
+                value = any(results[a] for a in arguments)
+            elif operation == "implies":
+                value = not results[arguments[0]] or results[arguments[1]]
+            else:
+                value = results[arguments[0]] == results[arguments[1]]
+            results.append(value)
+        return tuple(results[output] for output in self.outputs)
+
+    def source(self):
+        """Returns Python source for a function equivalent to run()."""
+        lines = ["def program(v):"]
+        for i, (operation, arguments) in enumerate(self.instructions):
+            names = [f"r{a}" for a in arguments]
+            if operation == "symbol":
+                expression = f"bool(v[{arguments[0]}])"
+            elif operation == "not":
+                expression = f"not {names[0]}"
+            elif operation == "and":
+                expression = " and ".join(names) or "True"
+            elif operation == "or":
+                expression = " or ".join(names) or "False"
+            elif operation == "implies":
+                expression = f"not {names[0]} or {names[1]}"
+            else:
+                expression = f"{names[0]} == {names[1]}"
+            lines.append(f"    r{i} = {expression}")
+        outputs = "".join(f"r{output}, " for output in self.outputs)
+        lines.append(f"    return ({outputs})")
+        return "\n".join(lines)
+
+    def compile(self):
+        """
+        Returns a flat Python function equivalent to run(), with one
+        assignment per instruction and no calls or recursion.
+        """
+        if self.function is None:
+            namespace = {}
+            exec(self.source(), namespace)
+            self.function = namespace["program"]
+        return self.function
+
+    def evaluate(self, model):
+        """Returns the value of each sentence in a model dict."""
+        try:
+            values = [model[name] for name in self.symbols]
+        except KeyError as e:
+            raise Exception(f"variable {e.args[0]} not in model")
+        return self.compile()(values)
+
+    def release_schedule(self):
+        """
+        Returns, for each instruction, the registers whose last use it is.
+        """
+        if self.releases is None:
+            last = {}
+            for i, (operation, arguments) in enumerate(self.instructions):
+                if operation != "symbol":
+                    for a in arguments:
+                        last[a] = i
+            self.releases = [[] for _ in self.instructions]
+            for register, i in last.items():
+                self.releases[i].append(register)
+        return self.releases
+
+    def run_vectors(self, columns, ones, results, start=0, stop=None):
+        """
+        Computes instructions start to stop into the dict results, where
+        each value holds many models at once: a boolean array, or words
+        of bits with one model per bit. columns has one such value per
+        symbol, and ones is the value that is true in every model.
+
+        Registers are released after their last use, so memory grows
+        with the width of the program rather than its length.
+        """
+        releases = self.release_schedule()
+        outputs = set(self.outputs)
+        if stop is None:
+            stop = len(self.instructions)
+        for i in range(start, stop):
+            operation, arguments = self.instructions[i]
+            if operation == "symbol":
+                value = columns[arguments[0]]
+            elif operation == "not":
+                value = results[arguments[0]] ^ ones
+            elif operation == "and":
+                value = ones
+                for a in arguments:
+                    value = value & results[a]
+            elif operation == "or":
+                value = ones ^ ones
+                for a in arguments:
+                    value = value | results[a]
+            elif operation == "implies":
+                value = (results[arguments[0]] ^ ones) | results[arguments[1]]
+            else:
+                value = results[arguments[0]] ^ results[arguments[1]] ^ ones
+            results[i] = value
+            for register in releases[i]:
+                if register not in outputs:
+                    del results[register]
+        return results
+
+    def evaluate_batch(self, columns):
+        """
+        Evaluates the sentences in many models at once. columns is a
+        boolean array with a row per symbol and a column per model.
+        Returns a boolean array per sentence.
+        """
+        columns = np.asarray(columns, dtype=bool)
+        ones = np.ones(columns.shape[1:], dtype=bool)
+        results = self.run_vectors(columns, ones, {})
+        return [results[output] for output in self.outputs]
+
+
+def model_check_compiled(knowledge, query):
+    """
+    Checks if knowledge base entails query by running a compiled
+    program on every model, stopping at the first counter-model.
+    """
+    program = Program([knowledge, query])
+    function = program.compile()
+    for values in itertools.product((False, True),
+                                    repeat=len(program.symbols)):
+        holds, entailed = function(values)
+        if holds and not entailed:
+            return False
+    return True
+
+
+def model_check_numpy(knowledge, query, block_bits=BLOCK_BITS):
+    """
+    Checks if knowledge base entails query by evaluating a compiled
+    program on blocks of 2 ** block_bits models as NumPy arrays.
+
+    Model number m sets symbol i to bit i of m, and blocks are checked
+    in order until one contains a counter-model.
+    """
+    program = Program([knowledge, query])
+    count = len(program.symbols)
+    if count > MAX_SYMBOLS:
+        raise ValueError(f"too many symbols to enumerate ({count})")
+    total = 1 << count
+    size = min(total, 1 << block_bits)
+    shifts = np.arange(count, dtype=np.int64)[:, np.newaxis]
+    for start in range(0, total, size):
+        models = np.arange(start, start + size, dtype=np.int64)
+        columns = (models >> shifts) & 1 == 1
+        holds, entailed = program.evaluate_batch(columns)
+        if np.any(holds & ~entailed):
+            return False
+    return True
+
+
+def model_check_bits(knowledge, query, block_bits=BLOCK_BITS,
+                     assignment=None):
+    """
+    Checks if knowledge base entails query with a bit-parallel truth
+    table over blocks of 2 ** block_bits models. With an assignment dict
+    from symbol names to truth values, only the models that agree with
+    it are checked.
+
+    The check stops at the first block with a counter-model.
+    """
+    return not any(counter_model_blocks(knowledge, query, block_bits,
+                                        assignment))
+
+
+def counter_model_blocks(knowledge, query, block_bits=BLOCK_BITS,
+                         assignment=None):
+    """
+    Generates, for each block of 2 ** block_bits models in turn, whether
+    it contains a model where knowledge holds and query does not.
+    Symbols in the assignment dict are fixed to their values rather
+    than enumerated.
+
+    Each free symbol is a column of 64-bit words with one model per bit,
+    so a sentence is computed for a whole block with a few bitwise NumPy
+    operations per instruction. The first six free symbols repeat the
+    same pattern in every word, and the rest are all ones or all zeros.
+
+    The conjuncts of the knowledge base are computed one at a time, and
+    a block is abandoned as soon as none of its models satisfy them.
+    """
+    if assignment is None:
+        assignment = {}
+    if knowledge.operation == "and":
+        conjuncts = list(knowledge.operands())
+    else:
+        conjuncts = [knowledge]
+    program = Program(conjuncts + [query])
+    free = [i for i, name in enumerate(program.symbols)
+            if name not in assignment]
+    count = len(free)
+    if count > MAX_SYMBOLS:
+        raise ValueError(f"too many symbols to enumerate ({count})")
+
+    # Models past the end of a table smaller than a word are masked out
+    total = 1 << count
+    valid = np.uint64(ONES if total >= WORD_BITS else (1 << total) - 1)
+    words = max(1, min(total, 1 << block_bits) // WORD_BITS)
+    ones = np.full(words, ONES, dtype=np.uint64)
+    zeros = ones ^ ones
+    columns = [ones if assignment.get(name) else zeros
+               for name in program.symbols]
+    for position, i in enumerate(free[:WORD_SYMBOLS]):
+        columns[i] = np.full(words, PATTERNS[position], dtype=np.uint64)
+
+    for start in range(0, max(1, total // WORD_BITS), words):
+        numbers = np.arange(start, start + words, dtype=np.uint64)
+        for position, i in enumerate(free[WORD_SYMBOLS:]):
+            bits = (numbers >> np.uint64(position)) & np.uint64(1)
+            columns[i] = np.uint64(0) - bits
+
+        results = {}
+        position = 0
+        holds = ones
+        for output in program.outputs[:-1]:
+            stop = max(position, output + 1)
+            program.run_vectors(columns, ones, results, position, stop)
+            position = stop
+            holds = holds & results[output]
+            if not holds.any():
+                yield False
+                break
+        else:
+            program.run_vectors(columns, ones, results, position)
+            counter = holds & (results[program.outputs[-1]] ^ ones) & valid
+            yield bool(counter.any())
@@ -0,0 +1,78 @@
+import random
+import string
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+def character_name(i):
+    """Returns the name of the ith character: A to Z, then AA, AB..."""
+    name = ""
+    i += 1
+    while i:
+        i, letter = divmod(i - 1, 26)
+        name = string.ascii_uppercase[letter] + name
+    return name
+
+
+def character_symbols(characters):
+    """Returns the (knight, knave) pair of Symbols of each character."""
+    return [(Symbol(f"{character_name(i)} is a Knight"),
+             Symbol(f"{character_name(i)} is a Knave"))
+            for i in range(characters)]
+
+
+def random_claim(rng, pairs, depth):
+    """
+    Returns a random claim about the characters, nesting And, Or, Not
+    and Biconditional up to depth levels above single symbols.
+    """
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(rng.choice(pairs))
+    kind = rng.randrange(4)
+    if kind == 0:
+        return Not(random_claim(rng, pairs, depth - 1))
+    if kind == 1:
+        return And(random_claim(rng, pairs, depth - 1),
+                   random_claim(rng, pairs, depth - 1))
+    if kind == 2:
+        return Or(random_claim(rng, pairs, depth - 1),
+                  random_claim(rng, pairs, depth - 1))
+    return Biconditional(random_claim(rng, pairs, depth - 1),
+                         random_claim(rng, pairs, depth - 1))
+
+
+def generate_puzzle(characters, statements, seed=None, depth=2):
+    """
+    Returns (knowledge, symbols, solution) for a random knights and
+    knaves puzzle with the given number of characters and statements.
+
+    A hidden solution makes each character a knight or a knave. Every
+    statement is a random claim by a random character, negated if needed
+    so that knights tell the truth and knaves lie in that solution, so
+    the puzzle is always satisfiable. As in puzzle.py, each character is
+    exactly one of a knight or a knave, and a statement is encoded as
+    what follows from the speaker being either one.
+
+    symbols lists the knight and knave Symbol of every character, and
+    solution maps each symbol name to its value in the hidden solution.
+    """
+    rng = random.Random(seed)
+    pairs = character_symbols(characters)
+    solution = {}
+    knowledge = And()
+    for knight, knave in pairs:
+        solution[knight.name] = rng.random() < 0.5
+        solution[knave.name] = not solution[knight.name]
+        knowledge.add(Or(knight, knave))
+        knowledge.add(Not(And(knight, knave)))
+
+    for _ in range(statements):
+        knight, knave = rng.choice(pairs)
+        claim = random_claim(rng, pairs, depth)
+        if claim.evaluate(solution) != solution[knight.name]:
+            claim = Not(claim)
+        knowledge.add(Implication(knight, claim))
+        knowledge.add(Implication(knave, Not(claim)))
+
+    symbols = [symbol for pair in pairs for symbol in pair]
+    return knowledge, symbols, solution
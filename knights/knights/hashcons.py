@@ -0,0 +1,79 @@
+from logic import Symbol
+
+
+class HashCons():
+    """
+    Builds sentences so that structurally identical ones are a single
+    shared object, which then caches its hash and symbols only once.
+
+    Sentences are looked up by their class and the identities of their
+    already shared operands, so no subtree is ever rehashed or compared.
+    Shared sentences are frozen, so And.add and Or.add refuse to change
+    them.
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.members = set()
+
+    def __len__(self):
+        return len(self.table)
+
+    def share(self, key, build):
+        """Returns the sentence for key, calling build() to create it."""
+        sentence = self.table.get(key)
+        if sentence is None:
+            sentence = build()
+            sentence.freeze()
+            self.table[key] = sentence
+            self.members.add(id(sentence))
+        return sentence
+
+    def symbol(self, name):
+        return self.share((Symbol, name), lambda: Symbol(name))
+
+    def make(self, cls, *operands):
+        """
+        Returns the shared sentence cls(*operands), such as
+        make(And, a, b). Operands are shared first if they are not.
+        """
+        members = self.members
+        operands = [operand if id(operand) in members
+                    else self.intern(operand) for operand in operands]
+        key = (cls, tuple(id(operand) for operand in operands))
+        return self.share(key, lambda: cls(*operands))
+
+    def intern(self, sentence):
+        """
+        Returns the shared sentence structurally identical to sentence,
+        adding it and any new subtrees, without recursion. New subtrees
+        are frozen copies, so sentence itself can still be changed.
+        """
+        if id(sentence) in self.members:
+            return sentence
+        shared = {}
+        stack = [(sentence, False)]
+        while stack:
+            current, ready = stack.pop()
+            if id(current) in shared:
+                continue
+            if id(current) in self.members:
+                shared[id(current)] = current
+                continue
+            if current.operation == "symbol":
+                shared[id(current)] = self.share(
+                    (Symbol, current.name), lambda: current
+                )
+                continue
+            operands = current.operands()
+            if not ready:
+                stack.append((current, True))
+                stack.extend((operand, False) for operand in operands)
+                continue
+
+            canonical = [shared[id(operand)] for operand in operands]
+            key = (type(current), tuple(id(operand) for operand in canonical))
+            shared[id(current)] = self.share(
+                key, lambda: type(current)(*canonical)
+            )
+        return shared[id(sentence)]
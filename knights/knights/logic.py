@@ -1,19 +1,168 @@
 import itertools
 
+from cnf import CNF
+from evaluator import model_check_bits, model_check_compiled, model_check_numpy
+from sat import Solver
+
+# Text between the operands of each operation in formulas
+SEPARATORS = {"and": " ∧ ", "or": " ∨  ",
+              "implies": " => ", "iff": " <=> "}
+
+# Formulas of an And or an Or without operands, which are always true
+# and always false, and of a symbol with an empty name
+EMPTY = {"and": "(∧)", "or": "(∨)", "symbol": "()"}
+
+# Binding strength of each binary operator read by parse(), weakest
+# first, and the operation it builds
+OPERATORS = {"<=>": (1, "iff"), "=>": (2, "implies"),
+             "∨": (3, "or"), "∧": (4, "and")}
+NEGATION = "¬"
+
+# Characters that end a symbol name in a formula
+DELIMITERS = "()¬∧∨"
+
 
 class Sentence():
 
+    # Subclasses add slots for their operands, so sentences carry no
+    # per-instance dict. The hash and symbol set are only cached once a
+    # sentence is frozen, as sentences shared by a HashCons are, since a
+    # sentence that can still change could leave those of any sentence
+    # containing it out of date.
+    __slots__ = ("hash_value", "symbol_set", "frozen")
+
+    # Name of the logical operation, used by compiled evaluators
+    operation = None
+
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
     def formula(self):
-        """Returns string formula representing logical sentence."""
-        return ""
+        """
+        Returns string formula representing logical sentence.
+
+        The formula is built without recursion, in time linear in its
+        length. Operands are parenthesized unless they are a bare name or
+        already parenthesized. An And or Or without operands is written
+        as (∧) or (∨).
+        """
+        bare = self.bare_operands()
+
+        def wrap(operand):
+            return [operand] if bare[id(operand)] else ["(", operand, ")"]
+
+        parts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            operation = item.operation
+            operands = item.operands()
+            if operation == "symbol":
+                parts.append(item.name or EMPTY["symbol"])
+            elif operation == "not":
+                stack.extend(reversed(["¬"] + wrap(operands[0])))
+            elif operation in ("and", "or") and not operands:
+                parts.append(EMPTY[operation])
+            elif operation in ("and", "or") and len(operands) == 1:
+                stack.append(operands[0])
+            elif operation is not None:
+                pieces = []
+                for i, operand in enumerate(operands):
+                    if i:
+                        pieces.append(SEPARATORS[operation])
+                    pieces.extend(wrap(operand))
+                stack.extend(reversed(pieces))
+        return "".join(parts)
+
+    def bare_operands(self):
+        """
+        Returns a dict from the id of each sentence in the tree to whether
+        its formula needs no parentheses as an operand, found without
+        recursion and without rescanning any formula.
+        """
+        bare = {}
+        stack = [(self, False)]
+        while stack:
+            sentence, ready = stack.pop()
+            if id(sentence) in bare:
+                continue
+            operands = sentence.operands()
+            if not ready:
+                stack.append((sentence, True))
+                stack.extend((operand, False) for operand in operands)
+                continue
+            operation = sentence.operation
+            if operation == "symbol":
+                name = sentence.name
+                bare[id(sentence)] = Sentence.parenthesize(name) == name
+            elif operation in ("and", "or") and len(operands) <= 1:
+                bare[id(sentence)] = (not operands
+                                      or bare[id(operands[0])])
+            else:
+                bare[id(sentence)] = operation is None
+        return bare
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.symbol_names())
+
+    def symbol_names(self):
+        """
+        Returns a frozenset of all symbols in the logical sentence,
+        computed from the sets of its operands and cached if frozen.
+        """
+        if self.symbol_set is not None:
+            return self.symbol_set
+        names = frozenset().union(
+            *[operand.symbol_names() for operand in self.operands()]
+        )
+        if self.frozen:
+            self.symbol_set = names
+        return names
+
+    def keep_hash(self, value):
+        """Returns value, the hash of the sentence, caching it if frozen."""
+        if self.frozen:
+            self.hash_value = value
+        return value
+
+    def start_cache(self, frozen=False):
+        """Sets up the logical sentence with nothing cached."""
+        self.hash_value = None
+        self.symbol_set = None
+        self.frozen = frozen
+
+    def freeze(self):
+        """
+        Marks the logical sentence as never changing again, so that its
+        hash and symbols are cached. Its operands must be frozen first.
+        """
+        if not all(operand.frozen for operand in self.operands()):
+            raise ValueError("operands of a frozen sentence must be frozen")
+        self.frozen = True
+
+    def check_changeable(self):
+        if self.frozen:
+            raise ValueError("cannot change a frozen sentence")
+
+    def operands(self):
+        """Returns the list of sentences the logical sentence is built from."""
+        return []
+
+    def encode(self, cnf):
+        """
+        Returns a CNF literal equivalent to the logical sentence, adding
+        Tseitin definitions for any new variables to cnf.
+        """
+        raise Exception("nothing to encode")
+
+    def require(self, cnf):
+        """Adds clauses to cnf that require the logical sentence to hold."""
+        cnf.add_clause([cnf.literal(self)])
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +192,24 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
+    operation = "symbol"
 
     def __init__(self, name):
         self.name = name
 
+        # A symbol has no operands that could change under it
+        self.start_cache(frozen=True)
+
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name
+        )
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        if self.hash_value is None:
+            self.hash_value = hash(("symbol", self.name))
+        return self.hash_value
 
     def __repr__(self):
         return self.name
@@ -63,22 +221,35 @@ class Symbol(Sentence):
             raise Exception(f"variable {self.name} not in model")
 
     def formula(self):
-        return self.name
+        return self.name or EMPTY["symbol"]
 
-    def symbols(self):
-        return {self.name}
+    def symbol_names(self):
+        if self.symbol_set is None:
+            self.symbol_set = frozenset([self.name])
+        return self.symbol_set
+
+    def encode(self, cnf):
+        return cnf.variable(self.name)
 
 
 class Not(Sentence):
+    __slots__ = ("operand",)
+    operation = "not"
+
     def __init__(self, operand):
         Sentence.validate(operand)
         self.operand = operand
+        self.start_cache()
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand
+        )
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        if self.hash_value is not None:
+            return self.hash_value
+        return self.keep_hash(hash(("not", hash(self.operand))))
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +257,34 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
-    def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+    def operands(self):
+        return [self.operand]
 
-    def symbols(self):
-        return self.operand.symbols()
+    def encode(self, cnf):
+        return -cnf.literal(self.operand)
 
 
 class And(Sentence):
+    __slots__ = ("conjuncts",)
+    operation = "and"
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
+        self.start_cache()
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And) and self.conjuncts == other.conjuncts
+        )
 
     def __hash__(self):
-        return hash(
+        if self.hash_value is not None:
+            return self.hash_value
+        return self.keep_hash(hash(
             ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        ))
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +293,54 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        self.check_changeable()
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
-    def formula(self):
-        if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                           for conjunct in self.conjuncts])
+    def operands(self):
+        return self.conjuncts
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def encode(self, cnf):
+        literals = [cnf.literal(conjunct) for conjunct in self.conjuncts]
+        if not literals:
+            return cnf.true()
+        if len(literals) == 1:
+            return literals[0]
+        variable = cnf.new_variable()
+        for literal in literals:
+            cnf.add_clause([-variable, literal])
+        cnf.add_clause([variable] + [-literal for literal in literals])
+        return variable
+
+    def require(self, cnf):
+        for conjunct in self.conjuncts:
+            conjunct.require(cnf)
 
 
 class Or(Sentence):
+    __slots__ = ("disjuncts",)
+    operation = "or"
+
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
+        self.start_cache()
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and self.disjuncts == other.disjuncts
+        )
 
     def __hash__(self):
-        return hash(
+        if self.hash_value is not None:
+            return self.hash_value
+        return self.keep_hash(hash(
             ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        ))
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,30 +349,54 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
-    def formula(self):
-        if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+    def add(self, disjunct):
+        self.check_changeable()
+        Sentence.validate(disjunct)
+        self.disjuncts.append(disjunct)
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def operands(self):
+        return self.disjuncts
+
+    def encode(self, cnf):
+        literals = [cnf.literal(disjunct) for disjunct in self.disjuncts]
+        if not literals:
+            return -cnf.true()
+        if len(literals) == 1:
+            return literals[0]
+        variable = cnf.new_variable()
+        for literal in literals:
+            cnf.add_clause([variable, -literal])
+        cnf.add_clause([-variable] + literals)
+        return variable
+
+    def require(self, cnf):
+        cnf.add_clause([cnf.literal(disjunct) for disjunct in self.disjuncts])
 
 
 class Implication(Sentence):
+    __slots__ = ("antecedent", "consequent")
+    operation = "implies"
+
     def __init__(self, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
         self.antecedent = antecedent
         self.consequent = consequent
+        self.start_cache()
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent
+        )
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        if self.hash_value is not None:
+            return self.hash_value
+        return self.keep_hash(hash(
+            ("implies", hash(self.antecedent), hash(self.consequent))
+        ))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +405,47 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
-    def formula(self):
-        antecedent = Sentence.parenthesize(self.antecedent.formula())
-        consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+    def operands(self):
+        return [self.antecedent, self.consequent]
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def encode(self, cnf):
+        antecedent = cnf.literal(self.antecedent)
+        consequent = cnf.literal(self.consequent)
+        variable = cnf.new_variable()
+        cnf.add_clause([-variable, -antecedent, consequent])
+        cnf.add_clause([variable, antecedent])
+        cnf.add_clause([variable, -consequent])
+        return variable
+
+    def require(self, cnf):
+        cnf.add_clause([-cnf.literal(self.antecedent),
+                        cnf.literal(self.consequent)])
 
 
 class Biconditional(Sentence):
+    __slots__ = ("left", "right")
+    operation = "iff"
+
     def __init__(self, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
         self.left = left
         self.right = right
+        self.start_cache()
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional)
+            and self.left == other.left
+            and self.right == other.right
+        )
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        if self.hash_value is not None:
+            return self.hash_value
+        return self.keep_hash(hash(
+            ("biconditional", hash(self.left), hash(self.right))
+        ))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,17 +456,244 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
-    def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
+    def operands(self):
+        return [self.left, self.right]
+
+    def encode(self, cnf):
+        left = cnf.literal(self.left)
+        right = cnf.literal(self.right)
+        variable = cnf.new_variable()
+        cnf.add_clause([-variable, -left, right])
+        cnf.add_clause([-variable, left, -right])
+        cnf.add_clause([variable, left, right])
+        cnf.add_clause([variable, -left, -right])
+        return variable
+
+    def require(self, cnf):
+        left = cnf.literal(self.left)
+        right = cnf.literal(self.right)
+        cnf.add_clause([-left, right])
+        cnf.add_clause([left, -right])
+
+
+def model_check(knowledge, query, backend="sat"):
+    """
+    Checks if knowledge base entails query.
+
+    backend is the name of a function in BACKENDS: "sat" hands the
+    problem to a CDCL solver, "enumerate" checks every model, and
+    "compiled" and "numpy" check every model with a compiled Program,
+    and "bits" checks 64 models per machine word.
+    """
+    try:
+        check = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"unknown model checking backend {backend}")
+    return check(knowledge, query)
+
+
+def model_check_sat(knowledge, query):
+    """
+    Checks if knowledge base entails query with a SAT solver.
+
+    The knowledge base entails the query exactly when the knowledge base
+    together with the negated query has no satisfying model.
+    """
+    cnf = CNF()
+    cnf.require(knowledge)
+    cnf.require(Not(query))
+    return not Solver(cnf.clauses).solve()
+
+
+def tokenize(text):
+    """
+    Splits a formula into parentheses, operators and Symbols.
+    Names run up to the next operator or parenthesis, so they may
+    contain spaces, and surrounding whitespace is ignored.
+    """
+    tokens = []
+    symbols = {}
+    i = 0
+    while i < len(text):
+        if text[i].isspace():
+            i += 1
+        elif text[i] in DELIMITERS:
+            tokens.append(text[i])
+            i += 1
+        elif text.startswith("<=>", i) or text.startswith("=>", i):
+            operator = "<=>" if text[i] == "<" else "=>"
+            tokens.append(operator)
+            i += len(operator)
+        else:
+            start = i
+            while (i < len(text) and text[i] not in DELIMITERS
+                   and not text.startswith("=>", i)
+                   and not text.startswith("<=>", i)):
+                i += 1
+            name = text[start:i].rstrip()
+            if name not in symbols:
+                symbols[name] = Symbol(name)
+            tokens.append(symbols[name])
+    return tokens
+
+
+def parse(text):
+    """
+    Parses a formula in the format written by formula() back into a
+    sentence, without recursion, so formula(parse(f)) == f as long as
+    no symbol name has surrounding whitespace or contains (, ), ¬, ∧,
+    ∨, => or <=>.
+
+    ¬ binds tightest, then ∧, ∨, => and <=>, and => groups to the right.
+    A chain of ∧ or ∨ outside parentheses becomes a single And or Or.
+    (∧) and (∨) are an And and an Or without operands, and () is a
+    symbol with an empty name.
+    """
+    operands = []
+    operators = []
+
+    # Ids of the And and Or sentences built from chains still open
+    chains = set()
+
+    def reduce():
+        """Applies the operator on top of the stack to its operands."""
+        operator = operators.pop()
+        if operator == NEGATION:
+            operands.append(Not(operands.pop()))
+            return
+        right = operands.pop()
+        left = operands.pop()
+        operation = OPERATORS[operator][1]
+        if operation in ("and", "or"):
+            if id(left) in chains and left.operation == operation:
+                left.add(right)
+                operands.append(left)
+            else:
+                chain = And if operation == "and" else Or
+                sentence = chain(left, right)
+                chains.add(id(sentence))
+                operands.append(sentence)
+        elif operation == "implies":
+            operands.append(Implication(left, right))
+        else:
+            operands.append(Biconditional(left, right))
+
+    expect_operand = True
+    tokens = tokenize(text)
+    position = 0
+    while position < len(tokens):
+        token = tokens[position]
+        position += 1
+        if expect_operand:
+            if isinstance(token, Symbol):
+                operands.append(token)
+                expect_operand = False
+            elif (token in ("∧", "∨") and operators and operators[-1] == "("
+                  and tokens[position:position + 1] == [")"]):
+                # (∧) or (∨) is an And or Or without operands
+                operators.pop()
+                position += 1
+                operands.append(And() if token == "∧" else Or())
+                expect_operand = False
+            elif token == ")" and operators and operators[-1] == "(":
+                # Nothing between parentheses is the empty name
+                operators.pop()
+                operands.append(Symbol(""))
+                expect_operand = False
+            elif token in ("(", NEGATION):
+                operators.append(token)
+            else:
+                raise ValueError(f"expected a sentence before {token}")
+        elif token == ")":
+            while operators and operators[-1] != "(":
+                reduce()
+            if not operators:
+                raise ValueError("unbalanced parentheses")
+            operators.pop()
+            chains.discard(id(operands[-1]))
+        elif token in OPERATORS:
+            strength = OPERATORS[token][0]
+            while operators and operators[-1] != "(" and (
+                operators[-1] == NEGATION
+                or OPERATORS[operators[-1]][0] > strength
+                or (OPERATORS[operators[-1]][0] == strength
+                    and token != "=>")
+            ):
+                reduce()
+            operators.append(token)
+            expect_operand = True
+        else:
+            raise ValueError(f"expected an operator before {token}")
+
+    if expect_operand:
+        raise ValueError("formula ends without a sentence")
+    while operators:
+        if operators[-1] == "(":
+            raise ValueError("unbalanced parentheses")
+        reduce()
+    return operands[0]
+
+
+class KnowledgeBase():
+    """
+    Knowledge base that answers many entailment queries from one SAT
+    solver, keeping its clauses and learned clauses between queries.
+
+    Every model found while refuting a query is kept, and a later query
+    that is false in one of them is answered without solving. Sentences
+    can be added at any time; entailed queries stay entailed, but the
+    kept models are discarded.
+    """
+
+    def __init__(self, *sentences):
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.pushed = 0
+        self.models = []
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        Sentence.validate(sentence)
+        self.cnf.require(sentence)
+        self.flush()
+        self.models = []
+
+    def flush(self):
+        """Passes clauses not yet seen by the solver on to it."""
+        for clause in self.cnf.clauses[self.pushed:]:
+            self.solver.add_clause(clause)
+        self.pushed = len(self.cnf.clauses)
+
+    def satisfiable(self):
+        """Checks if some model makes every sentence true."""
+        return self.solver.solve()
+
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        names = query.symbol_names()
+        for model in self.models:
+            if names <= model.keys() and not query.evaluate(model):
+                return False
+
+        literal = self.cnf.literal(query)
+        self.flush()
+        if not self.solver.solve([-literal]):
+            return True
+        self.models.append({
+            name: self.solver.model[variable]
+            for name, variable in self.cnf.variables.items()
+        })
+        return False
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def query(self, queries):
+        """Returns whether the knowledge base entails each of queries."""
+        return [self.entails(query) for query in queries]
 
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+def model_check_enumerate(knowledge, query):
+    """Checks if knowledge base entails query by enumerating every model."""
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
@@ -261,3 +728,12 @@ def model_check(knowledge, query):
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+BACKENDS = {
+    "sat": model_check_sat,
+    "enumerate": model_check_enumerate,
+    "compiled": model_check_compiled,
+    "numpy": model_check_numpy,
+    "bits": model_check_bits
+}
@@ -0,0 +1,104 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Event
+
+from cnf import CNF
+from evaluator import counter_model_blocks
+from logic import Not
+from sat import Solver
+
+# Subproblems per worker process, so that uneven ones still balance out
+CUBES_PER_PROCESS = 4
+
+# Problem attached inside each worker process
+worker_problem = None
+worker_stop = None
+
+
+def attach(knowledge, query, backend, stop):
+    """
+    Worker initializer that keeps the problem and the shared stop event.
+    The SAT backend encodes the problem into one solver up front, which
+    then answers every subproblem as a set of assumptions.
+    """
+    global worker_problem, worker_stop
+    worker_stop = stop
+    if backend == "sat":
+        cnf = CNF()
+        cnf.require(knowledge)
+        cnf.require(Not(query))
+        worker_problem = (backend, cnf, Solver(cnf.clauses))
+    else:
+        worker_problem = (backend, knowledge, query)
+
+
+def check_cube(cube):
+    """
+    Returns False if a counter-model agrees with the assignment in cube,
+    True if none does, or None if the search was stopped first.
+    Truth-table workers check the stop event after every block, and the
+    SAT solver after every conflict.
+    """
+    if worker_stop.is_set():
+        return None
+    backend = worker_problem[0]
+    if backend == "sat":
+        _, cnf, solver = worker_problem
+        assumptions = [cnf.variable(name) if value else -cnf.variable(name)
+                       for name, value in cube.items()]
+        satisfiable = solver.solve(assumptions, worker_stop)
+        return None if satisfiable is None else not satisfiable
+
+    _, knowledge, query = worker_problem
+    for found in counter_model_blocks(knowledge, query, assignment=cube):
+        if found:
+            return False
+        if worker_stop.is_set():
+            return None
+    return True
+
+
+def split_cubes(names, split):
+    """
+    Returns the 2 ** split assignments to the first split names,
+    each as a dict from name to truth value.
+    """
+    return [dict(zip(names[:split], values))
+            for values in itertools.product((False, True), repeat=split)]
+
+
+def parallel_model_check(knowledge, query, processes=None, split=None,
+                         backend="bits"):
+    """
+    Checks if knowledge base entails query across worker processes.
+
+    The models are split on the first `split` symbols in sorted order
+    into independent subproblems, each checked with the "bits" truth
+    table or the "sat" solver. As soon as one finds a counter-model the
+    others are told to stop and the pending ones are cancelled, and
+    running ones return at their next block or conflict.
+    """
+    if backend not in ("bits", "sat"):
+        raise ValueError(f"unknown parallel backend {backend}")
+    names = sorted(knowledge.symbol_names() | query.symbol_names())
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if split is None:
+        split = math.ceil(math.log2(processes * CUBES_PER_PROCESS))
+    split = min(split, len(names))
+
+    stop = Event()
+    executor = ProcessPoolExecutor(max_workers=processes, initializer=attach,
+                                   initargs=(knowledge, query, backend, stop))
+    try:
+        futures = [executor.submit(check_cube, cube)
+                   for cube in split_cubes(names, split)]
+        for future in as_completed(futures):
+            if future.result() is False:
+                stop.set()
+                return False
+        return True
+    finally:
+        executor.shutdown(cancel_futures=True)
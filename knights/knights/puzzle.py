@@ -84,8 +84,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
-            for symbol in symbols:
-                if model_check(knowledge, symbol):
+            entailed = KnowledgeBase(knowledge).query(symbols)
+            for symbol, holds in zip(symbols, entailed):
+                if holds:
                     print(f"    {symbol}")
 
 
@@ -0,0 +1,311 @@
+import heapq
+
+# Conflicts before the first restart, scaled by the Luby sequence
+RESTART_BASE = 100
+
+# Variable activities grow by this factor after every conflict, which
+# is equivalent to decaying all older activities
+ACTIVITY_GROWTH = 1 / 0.95
+ACTIVITY_LIMIT = 1e100
+
+
+def luby(i):
+    """Returns the ith element (from 1) of the Luby restart sequence."""
+    size, power = 1, 0
+    while size < i + 1:
+        size, power = 2 * size + 1, power + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        power -= 1
+        i %= size
+    return 2 ** power
+
+
+class Solver():
+    """
+    CDCL SAT solver over clauses of DIMACS-style integer literals.
+
+    Unit propagation uses two watched literals per clause. Conflicts are
+    analyzed to the first unique implication point, the learned clause is
+    kept, and the search jumps back to the level where it becomes unit.
+    Decisions pick the most active variable with its last saved phase,
+    and the search restarts on the Luby sequence.
+
+    Clauses may be added between calls to solve(), and solve() accepts
+    assumptions, so one solver can answer many related queries.
+    """
+
+    def __init__(self, clauses=()):
+        self.count = 0
+        self.value = [None]
+        self.level = [0]
+        self.reason = [None]
+        self.phase = [False]
+        self.activity = [0.0]
+        self.watches = {}
+        self.clauses = []
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+        self.order = []
+        self.increment = 1.0
+        self.ok = True
+        self.model = None
+        self.solves = 0
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def ensure(self, variable):
+        """Grows the per-variable arrays to include variable."""
+        while self.count < variable:
+            self.count += 1
+            self.value.append(None)
+            self.level.append(0)
+            self.reason.append(None)
+            self.phase.append(False)
+            self.activity.append(0.0)
+            self.watches[self.count] = []
+            self.watches[-self.count] = []
+            heapq.heappush(self.order, (0.0, self.count))
+
+    def literal_value(self, literal):
+        value = self.value[abs(literal)]
+        if value is None or literal > 0:
+            return value
+        return not value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause, returning False if the clauses are now known to be
+        unsatisfiable. Must be called between searches.
+        """
+        if not self.ok:
+            return False
+        self.cancel(0)
+
+        # Every variable gets a value in the model, even if the clause is
+        # already satisfied and so never kept
+        for literal in literals:
+            self.ensure(abs(literal))
+        clause = []
+        for literal in literals:
+            value = self.literal_value(literal)
+            if value is True or -literal in clause:
+                return True
+            if value is None and literal not in clause:
+                clause.append(literal)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+        return self.ok
+
+    def attach(self, clause):
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.value[variable] = literal > 0
+        self.level[variable] = len(self.trail_lim)
+        self.reason[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagates every assignment on the trail, returning the index of
+        a conflicting clause or None. Each clause watches its first two
+        literals, and the implied literal of a reason is always first.
+        """
+        value = self.value
+        clauses = self.clauses
+        watches = self.watches
+        trail = self.trail
+        while self.head < len(trail):
+            false_literal = -trail[self.head]
+            self.head += 1
+            self.propagations += 1
+            watching = watches[false_literal]
+            kept = []
+            watches[false_literal] = kept
+            for position, index in enumerate(watching):
+                clause = clauses[index]
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                first_value = value[abs(first)]
+                if first_value is not None and first_value == (first > 0):
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    candidate = clause[k]
+                    candidate_value = value[abs(candidate)]
+                    if (candidate_value is None
+                            or candidate_value == (candidate > 0)):
+                        clause[1], clause[k] = candidate, false_literal
+                        watches[candidate].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if first_value is None:
+                        self.assign(first, index)
+                    else:
+                        kept.extend(watching[position + 1:])
+                        return index
+        return None
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > ACTIVITY_LIMIT:
+            for v in range(1, self.count + 1):
+                self.activity[v] /= ACTIVITY_LIMIT
+            self.increment /= ACTIVITY_LIMIT
+            self.order = [(-self.activity[v], v)
+                          for v in range(1, self.count + 1)
+                          if self.value[v] is None]
+            heapq.heapify(self.order)
+        elif self.value[variable] is None:
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+
+    def analyze(self, conflict):
+        """
+        Returns the learned clause for a conflict, asserting literal
+        first, and the level to jump back to.
+        """
+        current = len(self.trail_lim)
+        learned = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for other in (clause if literal is None else clause[1:]):
+                variable = abs(other)
+                if variable not in seen and self.level[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if self.level[variable] == current:
+                        pending += 1
+                    else:
+                        learned.append(other)
+
+            # Walk back to the most recent literal involved in the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reason[abs(literal)]]
+        learned[0] = -literal
+
+        if len(learned) == 1:
+            return learned, 0
+        # The second watch must be the literal assigned at the jump level
+        deepest = max(range(1, len(learned)),
+                      key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[deepest] = learned[deepest], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def cancel(self, level):
+        """Undoes every assignment above level."""
+        if len(self.trail_lim) <= level:
+            return
+        for literal in self.trail[self.trail_lim[level]:]:
+            variable = abs(literal)
+            self.value[variable] = None
+            self.reason[variable] = None
+            self.phase[variable] = literal > 0
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        """Returns the next decision literal, or None if all are assigned."""
+        while self.order:
+            _, variable = heapq.heappop(self.order)
+            if self.value[variable] is None:
+                return variable if self.phase[variable] else -variable
+        return None
+
+    def solve(self, assumptions=(), stop=None):
+        """
+        Returns True if the clauses are satisfiable with every literal in
+        assumptions true, leaving a satisfying assignment in self.model as
+        a list indexed by variable. Returns False otherwise.
+
+        If stop, an event such as a threading.Event, is given, it is
+        checked after every conflict, and None is returned once it is set.
+        """
+        self.model = None
+        self.solves += 1
+        if not self.ok:
+            return False
+        for literal in assumptions:
+            self.ensure(abs(literal))
+        self.cancel(0)
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+
+        restarts = 0
+        budget = RESTART_BASE * luby(restarts)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                budget -= 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                if stop is not None and stop.is_set():
+                    self.cancel(0)
+                    return None
+                learned, level = self.analyze(conflict)
+                self.cancel(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.assign(learned[0], self.attach(learned))
+                self.increment *= ACTIVITY_GROWTH
+                continue
+
+            if budget <= 0:
+                restarts += 1
+                budget = RESTART_BASE * luby(restarts)
+                self.cancel(0)
+                continue
+
+            # Assumptions are decided first, one per decision level
+            literal = None
+            while len(self.trail_lim) < len(assumptions):
+                assumption = assumptions[len(self.trail_lim)]
+                value = self.literal_value(assumption)
+                if value is False:
+                    self.cancel(0)
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if value is None:
+                    literal = assumption
+                    break
+            if literal is None:
+                literal = self.decide()
+                if literal is None:
+                    self.model = list(self.value)
+                    self.cancel(0)
+                    return True
+                self.trail_lim.append(len(self.trail))
+            self.decisions += 1
+            self.assign(literal, None)
@@ -0,0 +1,148 @@
+import struct
+import sys
+from array import array
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+MAGIC = b"KNIGHTS\0"
+VERSION = 1
+
+# Magic, format version, and the number of names, bytes of names,
+# program words and root sentences that follow
+PREAMBLE = struct.Struct("<8sIIIII")
+
+# Operation codes in files are positions in this list, stored in the
+# low bits of the word before a sentence's operands
+OPERATIONS = ["symbol", "not", "and", "or", "implies", "iff"]
+CODE_BITS = 3
+CODE_MASK = (1 << CODE_BITS) - 1
+CLASSES = {
+    "not": Not,
+    "and": And,
+    "or": Or,
+    "implies": Implication,
+    "iff": Biconditional
+}
+
+
+def words_to_bytes(words):
+    """Returns an array of unsigned 32-bit words as little-endian bytes."""
+    if sys.byteorder == "big":
+        words = array("I", words)
+        words.byteswap()
+    return words.tobytes()
+
+
+def words_from_bytes(data, offset, count):
+    words = array("I")
+    words.frombytes(data[offset:offset + count * words.itemsize])
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+
+def dumps(sentences):
+    """
+    Returns a list of sentences in a compact binary format.
+
+    Sentences are written in post-order, each as one word holding its
+    operation code and operand count followed by a word per operand.
+    An operand word refers to a symbol name when its lowest bit is 0
+    and to an earlier sentence when it is 1. Structurally identical
+    sentences are written once and loaded as one shared object, and
+    loading needs no recursion.
+    """
+    codes = {operation: i for i, operation in enumerate(OPERATIONS)}
+    names = {}
+    nodes = {}
+    references = {}
+    words = array("I")
+    roots = array("I")
+    for root in sentences:
+        stack = [(root, False)]
+        while stack:
+            sentence, ready = stack.pop()
+            if id(sentence) in references:
+                continue
+            if sentence.operation == "symbol":
+                index = names.setdefault(sentence.name, len(names))
+                references[id(sentence)] = (sentence, index << 1)
+                continue
+            operands = sentence.operands()
+            if not ready:
+                stack.append((sentence, True))
+                stack.extend((operand, False) for operand in operands)
+                continue
+
+            key = (codes[sentence.operation],) + tuple(
+                references[id(operand)][1] for operand in operands
+            )
+            if key not in nodes:
+                nodes[key] = (len(nodes) << 1) | 1
+                words.append(key[0] | (len(operands) << CODE_BITS))
+                words.extend(key[1:])
+
+            # Keep the sentence alive so its id cannot be reused
+            references[id(sentence)] = (sentence, nodes[key])
+        roots.append(references[id(root)][1])
+
+    encoded = [name.encode("utf-8") for name in names]
+    lengths = array("I", [len(name) for name in encoded])
+    return b"".join([
+        PREAMBLE.pack(MAGIC, VERSION, len(encoded), sum(lengths), len(words),
+                      len(roots)),
+        words_to_bytes(lengths),
+        b"".join(encoded),
+        words_to_bytes(words),
+        words_to_bytes(roots)
+    ])
+
+
+def loads(data):
+    """Returns the list of sentences in data written by dumps()."""
+    if len(data) < PREAMBLE.size:
+        raise ValueError("not a sentence file")
+    magic, version, count, size, length, roots = PREAMBLE.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a sentence file of this version")
+
+    offset = PREAMBLE.size
+    lengths = words_from_bytes(data, offset, count)
+    offset += 4 * count
+    symbols = []
+    for name_length in lengths:
+        name = str(data[offset:offset + name_length], "utf-8")
+        symbols.append(Symbol(name))
+        offset += name_length
+    words = words_from_bytes(data, offset, length)
+    offset += 4 * length
+    outputs = words_from_bytes(data, offset, roots)
+
+    def resolve(reference):
+        if reference & 1:
+            return sentences[reference >> 1]
+        return symbols[reference >> 1]
+
+    sentences = []
+    i = 0
+    while i < len(words):
+        operation = OPERATIONS[words[i] & CODE_MASK]
+        operands = words[i] >> CODE_BITS
+        arguments = words[i + 1:i + 1 + operands]
+        i += 1 + operands
+        sentences.append(CLASSES[operation](
+            *[resolve(reference) for reference in arguments]
+        ))
+    return [resolve(output) for output in outputs]
+
+
+def dump(sentences, path):
+    """Writes a list of sentences to a file in the format of dumps()."""
+    with open(path, "wb") as f:
+        f.write(dumps(sentences))
+
+
+def load(path):
+    """Reads the list of sentences in a file written by dump()."""
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -0,0 +1,357 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from crawler import crawl_to_disk, load_graph
+from incremental import update_pagerank
+from outofcore import (VECTORS, EdgeFile, out_of_core_pagerank,
+                       write_random_edges)
+from pagerank import DAMPING, crawl
+from personalized import PersonalizedRanks, personalized_pagerank
+from sampler import SURFERS, sample_ranks
+from solvers import SOLVERS
+from sparse import TOLERANCE, LinkGraph, power_iteration, random_graph
+
+
+def iterate_benchmark(sizes, degree, tolerance, seed):
+    """
+    Times building the sparse link matrix and running power iteration
+    on random graphs with each number of edges and `degree` links per
+    page on average.
+    """
+    print(f"{'edges':>10} {'pages':>9} {'build s':>8} {'iterations':>10} "
+          f"{'solve s':>8} {'ms/iter':>8} {'Medges/s':>9}")
+    for edges in sizes:
+        pages = max(2, edges // degree)
+        sources, targets = random_graph(pages, edges, seed)
+        start = time.perf_counter()
+        graph = LinkGraph.from_edges(pages, sources, targets)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, residuals = power_iteration(graph, DAMPING, tolerance)
+        solved = time.perf_counter() - start
+        per_iteration = solved / len(residuals)
+        print(f"{graph.edge_count():>10} {pages:>9} {built:>8.3f} "
+              f"{len(residuals):>10} {solved:>8.3f} "
+              f"{per_iteration * 1000:>8.2f} "
+              f"{graph.edge_count() / per_iteration / 1e6:>9.1f}")
+
+
+def sample_benchmark(pages, degree, samples, surfers, processes, seed):
+    """
+    Times the random surfer sampler on a random graph with each number
+    of surfers and processes, and reports the L1 error of its estimate
+    against power iteration.
+    """
+    sources, targets = random_graph(pages, pages * degree, seed)
+    graph = LinkGraph.from_edges(pages, sources, targets)
+    exact, _ = power_iteration(graph, DAMPING, 1e-12)
+    print(f"{'surfers':>8} {'processes':>9} {'seconds':>8} "
+          f"{'Msamples/s':>10} {'L1 error':>9}")
+    for surfer_count in surfers:
+        for process_count in processes:
+            start = time.perf_counter()
+            estimate = sample_ranks(graph, DAMPING, samples, surfer_count,
+                                    seed, process_count)
+            elapsed = time.perf_counter() - start
+            error = np.abs(estimate - exact).sum()
+            print(f"{surfer_count:>8} {process_count:>9} {elapsed:>8.3f} "
+                  f"{samples / elapsed / 1e6:>10.2f} {error:>9.4f}")
+
+
+def write_site(directory, pages, degree, seed):
+    """
+    Writes a directory of pages named 0.html, 1.html... with about
+    `degree` random links each, padded with text between the links.
+    """
+    sources, targets = random_graph(pages, pages * degree, seed)
+    starts = np.searchsorted(sources, np.arange(pages + 1))
+    filler = "<p>" + "lorem ipsum " * 20 + "</p>\n"
+    for page in range(pages):
+        links = targets[starts[page]:starts[page + 1]]
+        with open(os.path.join(directory, f"{page}.html"), "w") as f:
+            f.write("<html><body>\n")
+            for link in links.tolist():
+                f.write(filler)
+                f.write(f'<a href="{link}.html">{link}</a>\n')
+            f.write("</body></html>\n")
+
+
+def crawl_benchmark(sizes, degree, processes, seed):
+    """
+    Times crawl against crawling to edge files on disk with each number
+    of processes, for generated sites with each number of pages.
+    """
+    print(f"{'pages':>8} {'links':>9} {'method':>12} {'seconds':>8} "
+          f"{'pages/s':>9}")
+    for pages in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            site = os.path.join(directory, "site")
+            os.mkdir(site)
+            write_site(site, pages, degree, seed)
+
+            start = time.perf_counter()
+            corpus = crawl(site)
+            elapsed = time.perf_counter() - start
+            links = sum(len(links) for links in corpus.values())
+            del corpus
+            print(f"{pages:>8} {links:>9} {'crawl':>12} {elapsed:>8.3f} "
+                  f"{pages / elapsed:>9.0f}")
+
+            for process_count in processes:
+                output = os.path.join(directory, f"out{process_count}")
+                start = time.perf_counter()
+                _, links = crawl_to_disk(site, output, process_count)
+                elapsed = time.perf_counter() - start
+                graph = load_graph(output)
+                assert graph.edge_count() == links
+                method = f"disk x{process_count}"
+                print(f"{pages:>8} {links:>9} {method:>12} {elapsed:>8.3f} "
+                      f"{pages / elapsed:>9.0f}")
+
+
+def incremental_benchmark(sizes, degree, changes, tolerance, seed):
+    """
+    Times updating the ranks of generated sites after `changes` pages
+    are rewritten with new links, against crawling and solving again.
+    """
+    print(f"{'pages':>8} {'method':>12} {'seconds':>8} {'iterations':>10}")
+    rng = np.random.default_rng(seed)
+    for pages in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            site = os.path.join(directory, "site")
+            os.mkdir(site)
+            write_site(site, pages, degree, seed)
+            state = os.path.join(directory, "state")
+            update_pagerank(site, state, DAMPING, tolerance)
+
+            # Rewrite some pages with links to random pages
+            for page in rng.choice(pages, size=changes, replace=False):
+                links = rng.choice(pages, size=degree, replace=False)
+                with open(os.path.join(site, f"{page}.html"), "w") as f:
+                    for link in links.tolist():
+                        f.write(f'<a href="{link}.html">{link}</a>\n')
+
+            start = time.perf_counter()
+            _, _, residuals = update_pagerank(site, state, DAMPING, tolerance)
+            elapsed = time.perf_counter() - start
+            print(f"{pages:>8} {'incremental':>12} {elapsed:>8.3f} "
+                  f"{len(residuals):>10}")
+
+            start = time.perf_counter()
+            fresh = os.path.join(directory, "fresh")
+            crawl_to_disk(site, fresh)
+            _, residuals = power_iteration(load_graph(fresh), DAMPING,
+                                           tolerance)
+            elapsed = time.perf_counter() - start
+            print(f"{pages:>8} {'full':>12} {elapsed:>8.3f} "
+                  f"{len(residuals):>10}")
+
+
+def solver_benchmark(corpora, sizes, degree, damping, tolerance, methods,
+                     seed):
+    """
+    Compares the iterations and time each solver needs to reach
+    tolerance on the bundled corpora and on random graphs with each
+    number of edges, and the L1 error of the ranks it returns.
+    """
+    graphs = [(corpus, LinkGraph.from_corpus(crawl(corpus)))
+              for corpus in corpora]
+    for edges in sizes:
+        pages = max(2, edges // degree)
+        graphs.append((f"{edges} edges",
+                       LinkGraph.from_edges(pages,
+                                            *random_graph(pages, edges,
+                                                          seed))))
+
+    print(f"{'graph':>14} {'method':>12} {'iterations':>10} {'seconds':>8} "
+          f"{'L1 error':>9}")
+    for name, graph in graphs:
+        exact, _ = power_iteration(graph, damping, tolerance / 1000, 100000)
+        for method in methods:
+            start = time.perf_counter()
+            ranks, residuals = SOLVERS[method](graph, damping, tolerance)
+            elapsed = time.perf_counter() - start
+            error = np.abs(ranks - exact).sum()
+            print(f"{name:>14} {method:>12} {len(residuals):>10} "
+                  f"{elapsed:>8.3f} {error:>9.2e}")
+
+
+def personalized_benchmark(pages, degree, seed_sets, seeds, separate,
+                           tolerance, seed):
+    """
+    Times solving personalized PageRank for many random seed sets in one
+    batch against solving `separate` of them one at a time, and then
+    asking a cache for the same seed sets again.
+    """
+    sources, targets = random_graph(pages, pages * degree, seed)
+    graph = LinkGraph.from_edges(pages, sources, targets)
+    rng = np.random.default_rng(seed)
+    sets = [rng.choice(pages, size=seeds, replace=False).tolist()
+            for _ in range(seed_sets)]
+
+    print(f"{'method':>10} {'seed sets':>9} {'seconds':>8} {'ms/set':>8}")
+    start = time.perf_counter()
+    cache = PersonalizedRanks(graph, DAMPING, tolerance)
+    cache.ranks(sets)
+    elapsed = time.perf_counter() - start
+    print(f"{'batched':>10} {seed_sets:>9} {elapsed:>8.3f} "
+          f"{elapsed / seed_sets * 1000:>8.2f}")
+
+    start = time.perf_counter()
+    for seed_set in sets[:separate]:
+        teleport = np.zeros((pages, 1))
+        teleport[seed_set] = 1
+        personalized_pagerank(graph, DAMPING, teleport, tolerance)
+    elapsed = time.perf_counter() - start
+    print(f"{'separate':>10} {separate:>9} {elapsed:>8.3f} "
+          f"{elapsed / max(1, separate) * 1000:>8.2f}")
+
+    start = time.perf_counter()
+    cache.ranks(sets)
+    elapsed = time.perf_counter() - start
+    print(f"{'cached':>10} {seed_sets:>9} {elapsed:>8.3f} "
+          f"{elapsed / seed_sets * 1000:>8.2f}")
+
+
+def out_of_core_benchmark(pages, degree, memory_limit, tolerance, seed):
+    """
+    Generates an edge file, larger than memory_limit by default, and
+    reports the time and read throughput of each iteration of PageRank
+    computed from it within memory_limit. Also reports the most memory
+    allocated while computing it, which memory_limit bounds, and the
+    peak memory of the process, which also counts Python itself,
+    generating the file, and the pages of the file being read.
+    """
+    # Only available on Unix
+    import resource
+
+    if VECTORS * 8 * pages >= memory_limit:
+        sys.exit(f"The ranks of {pages} pages do not fit in the memory limit")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "edges.npy")
+        start = time.perf_counter()
+        write_random_edges(path, pages, degree, seed)
+        edge_file = EdgeFile(path, pages)
+        megabytes = edge_file.nbytes() / 1e6
+        print(f"Wrote {edge_file.edge_count()} links, {megabytes:.0f} MB, "
+              f"in {time.perf_counter() - start:.1f}s; memory limit "
+              f"{memory_limit / 1e6:.0f} MB")
+
+        print(f"{'iteration':>9} {'residual':>9} {'seconds':>8} "
+              f"{'MB/s':>8}")
+
+        def report(iteration, residual, seconds):
+            print(f"{iteration + 1:>9} {residual:>9.2e} {seconds:>8.2f} "
+                  f"{megabytes / seconds:>8.1f}")
+
+        tracemalloc.start()
+        out_of_core_pagerank(edge_file, DAMPING, tolerance,
+                             memory_limit=memory_limit, report=report)
+        allocated = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        edge_file.close()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            peak *= 1024
+        print(f"Peak allocated {allocated / 1e6:.0f} MB, peak resident "
+              f"{peak / 1e6:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    iterate = subparsers.add_parser("iterate")
+    iterate.add_argument("--sizes", type=int, nargs="+",
+                         default=[10**4, 10**5, 10**6, 10**7])
+    iterate.add_argument("--degree", type=int, default=10)
+    iterate.add_argument("--tolerance", type=float, default=TOLERANCE)
+    iterate.add_argument("--seed", type=int, default=0)
+
+    sample = subparsers.add_parser("sample")
+    sample.add_argument("--pages", type=int, default=10**4)
+    sample.add_argument("--degree", type=int, default=10)
+    sample.add_argument("--samples", type=int, default=10**7)
+    sample.add_argument("--surfers", type=int, nargs="+",
+                        default=[1, 100, SURFERS, 10**5])
+    sample.add_argument("--processes", type=int, nargs="+", default=[1])
+    sample.add_argument("--seed", type=int, default=0)
+
+    crawling = subparsers.add_parser("crawl")
+    crawling.add_argument("--sizes", type=int, nargs="+",
+                          default=[10**3, 10**4, 10**5])
+    crawling.add_argument("--degree", type=int, default=10)
+    crawling.add_argument("--processes", type=int, nargs="+",
+                          default=[1, os.cpu_count()])
+    crawling.add_argument("--seed", type=int, default=0)
+
+    incremental = subparsers.add_parser("incremental")
+    incremental.add_argument("--sizes", type=int, nargs="+",
+                             default=[10**4, 10**5])
+    incremental.add_argument("--degree", type=int, default=10)
+    incremental.add_argument("--changes", type=int, default=10)
+    incremental.add_argument("--tolerance", type=float, default=TOLERANCE)
+    incremental.add_argument("--seed", type=int, default=0)
+
+    solver = subparsers.add_parser("solvers")
+    solver.add_argument("--corpora", nargs="*",
+                        default=["corpus0", "corpus1", "corpus2"])
+    solver.add_argument("--sizes", type=int, nargs="*",
+                        default=[10**5, 10**6, 10**7])
+    solver.add_argument("--degree", type=int, default=10)
+    solver.add_argument("--damping", type=float, default=DAMPING)
+    solver.add_argument("--tolerance", type=float, default=TOLERANCE)
+    solver.add_argument("--methods", nargs="+", choices=list(SOLVERS),
+                        default=list(SOLVERS))
+    solver.add_argument("--seed", type=int, default=0)
+
+    personal = subparsers.add_parser("personalized")
+    personal.add_argument("--pages", type=int, default=10**5)
+    personal.add_argument("--degree", type=int, default=10)
+    personal.add_argument("--seed-sets", type=int, default=256)
+    personal.add_argument("--seeds", type=int, default=5)
+    personal.add_argument("--separate", type=int, default=16)
+    personal.add_argument("--tolerance", type=float, default=TOLERANCE)
+    personal.add_argument("--seed", type=int, default=0)
+
+    outofcore = subparsers.add_parser("outofcore")
+    outofcore.add_argument("--pages", type=int, default=10**6)
+    outofcore.add_argument("--degree", type=int, default=20)
+    outofcore.add_argument("--memory-limit", type=int, default=64 * 10**6)
+    outofcore.add_argument("--tolerance", type=float, default=TOLERANCE)
+    outofcore.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.benchmark == "iterate":
+        iterate_benchmark(args.sizes, args.degree, args.tolerance, args.seed)
+    elif args.benchmark == "sample":
+        sample_benchmark(args.pages, args.degree, args.samples, args.surfers,
+                         args.processes, args.seed)
+    elif args.benchmark == "crawl":
+        crawl_benchmark(args.sizes, args.degree, args.processes, args.seed)
+    elif args.benchmark == "incremental":
+        incremental_benchmark(args.sizes, args.degree, args.changes,
+                              args.tolerance, args.seed)
+    elif args.benchmark == "solvers":
+        solver_benchmark(args.corpora, args.sizes, args.degree, args.damping,
+                         args.tolerance, args.methods, args.seed)
+    elif args.benchmark == "personalized":
+        personalized_benchmark(args.pages, args.degree, args.seed_sets,
+                               args.seeds, args.separate, args.tolerance,
+                               args.seed)
+    elif args.benchmark == "outofcore":
+        out_of_core_benchmark(args.pages, args.degree, args.memory_limit,
+                              args.tolerance, args.seed)
+    else:
+        sys.exit(f"Unknown benchmark {args.benchmark}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import argparse
+import codecs
+import hashlib
+import os
+import posixpath
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sparse import LinkGraph
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Bytes read from a page at a time, and the most characters kept back from
+# one chunk to the next when a link might continue across the boundary
+CHUNK_SIZE = 1 << 16
+MAX_TAG = 4096
+
+# Pages parsed per task given to a worker process
+BATCH_PAGES = 256
+
+# Files making up a crawl written by crawl_to_disk
+PAGES_FILE = "pages.txt"
+EDGES_FILE = "edges.npy"
+FILES_FILE = "files.npz"
+MISSING_FILE = "missing.txt"
+MISSING_SOURCES_FILE = "missing.npy"
+RANKS_FILE = "ranks.npy"
+
+# Bytes in the hash kept of each page's contents
+DIGEST_SIZE = 16
+
+
+def find_pages(directory):
+    """
+    Returns the sorted paths, relative to directory and separated by
+    "/", of every HTML page in the directory tree.
+    """
+    pages = []
+    for root, _, filenames in os.walk(directory):
+        relative = os.path.relpath(root, directory)
+        for filename in filenames:
+            if filename.endswith(".html"):
+                path = os.path.normpath(os.path.join(relative, filename))
+                pages.append(path.replace(os.sep, "/"))
+    pages.sort()
+    return pages
+
+
+def read_links(path, chunk_size=CHUNK_SIZE, digest=None):
+    """
+    Yields the target of every link in the HTML file at path, reading
+    it in chunks so that large pages are never held in memory at once.
+    The bytes read are also added to digest, a hashlib object, if given.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as f:
+        tail = ""
+        while True:
+            data = f.read(chunk_size)
+            if digest is not None:
+                digest.update(data)
+            text = tail + decoder.decode(data, final=not data)
+            end = 0
+            for match in LINK.finditer(text):
+                yield match.group(1)
+                end = match.end()
+            if not data:
+                return
+
+            # Keep any tag that has started but not yet ended
+            cut = text.rfind("<a", end)
+            if cut < 0:
+                cut = len(text) - 1 if text.endswith("<") else len(text)
+            tail = text[max(cut, len(text) - MAX_TAG):]
+
+
+def new_digest():
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def resolve(page, link):
+    """
+    Returns the page a link on page points to, as a path relative to the
+    root of the crawl, ignoring any query or fragment.
+    """
+    folder = posixpath.dirname(page)
+    if "/" not in link and "#" not in link and "?" not in link:
+        # Most links name a page in the same directory
+        if link not in (".", ".."):
+            return f"{folder}/{link}" if folder else link
+    link = link.split("#", 1)[0].split("?", 1)[0]
+    if link.startswith("/"):
+        return posixpath.normpath(link.lstrip("/"))
+    return posixpath.normpath(posixpath.join(folder, link))
+
+
+def parse_batch(directory, pages, chunk_size=CHUNK_SIZE):
+    """
+    Returns, for each page in a batch, a tuple of the sorted distinct
+    pages it links to other than itself, which may not all exist, and
+    the modification time in nanoseconds, size and digest of its file.
+    """
+    results = []
+    for page in pages:
+        path = os.path.join(directory, *page.split("/"))
+        info = os.stat(path)
+        digest = new_digest()
+        links = set(read_links(path, chunk_size, digest))
+        targets = set(resolve(page, link) for link in links)
+        targets.discard(page)
+        results.append((sorted(targets), info.st_mtime_ns, info.st_size,
+                        digest.digest()))
+    return results
+
+
+def parse_pages(directory, pages, processes=1, chunk_size=CHUNK_SIZE,
+                batch_pages=BATCH_PAGES):
+    """
+    Yields the result of parse_batch for each of pages in order, parsing
+    batches in worker processes if processes is more than one.
+    """
+    batches = [pages[i:i + batch_pages]
+               for i in range(0, len(pages), batch_pages)]
+    arguments = ([directory] * len(batches), batches,
+                 [chunk_size] * len(batches))
+    if processes <= 1:
+        for results in map(parse_batch, *arguments):
+            yield from results
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for results in executor.map(parse_batch, *arguments):
+            yield from results
+
+
+def split_links(targets, index):
+    """
+    Returns the page numbers of the targets that are in index, and the
+    targets that are not but could become pages if they were added.
+    """
+    found = []
+    missing = []
+    for target in targets:
+        if target in index:
+            found.append(index[target])
+        elif target.endswith(".html"):
+            missing.append(target)
+    return found, missing
+
+
+def write_pages(output, pages):
+    with open(os.path.join(output, PAGES_FILE), "w", encoding="utf-8") as f:
+        for page in pages:
+            f.write(page + "\n")
+
+
+def write_missing(output, sources, names):
+    """
+    Writes links to pages that do not exist, so that they can be added
+    when those pages are.
+    """
+    np.save(os.path.join(output, MISSING_SOURCES_FILE), sources)
+    with open(os.path.join(output, MISSING_FILE), "w",
+              encoding="utf-8") as f:
+        for name in names:
+            f.write(name + "\n")
+
+
+def write_files(output, mtimes, sizes, digests):
+    np.savez(os.path.join(output, FILES_FILE), mtime=mtimes, size=sizes,
+             digest=digests)
+
+
+def crawl_to_disk(directory, output, processes=1, chunk_size=CHUNK_SIZE,
+                  batch_pages=BATCH_PAGES):
+    """
+    Crawls every HTML page in a directory tree into an output directory,
+    returning the number of pages and links written.
+
+    Pages are numbered by their position in the sorted list of paths
+    written to pages.txt, one per line. Links are written to edges.npy
+    as an array of (source, target) rows of page numbers, sorted by
+    source, so the corpus never has to exist as sets of strings. Links
+    to pages outside the tree are left out of the graph, as in crawl.
+    Pages are parsed in batches, by worker processes if processes is
+    more than one.
+
+    The modification time, size and hash of every page, and links to
+    HTML pages that do not exist, are kept for update_crawl.
+    """
+    os.makedirs(output, exist_ok=True)
+    pages = find_pages(directory)
+    write_pages(output, pages)
+    index = {page: i for i, page in enumerate(pages)}
+    dtype = np.int32 if len(pages) < 2**31 else np.int64
+    mtimes = np.zeros(len(pages), dtype=np.int64)
+    sizes = np.zeros(len(pages), dtype=np.int64)
+    digests = np.zeros(len(pages), dtype=f"V{DIGEST_SIZE}")
+    missing_sources = []
+    missing_names = []
+
+    scratch = os.path.join(output, EDGES_FILE + ".tmp")
+    edges = 0
+    with open(scratch, "wb") as f:
+        sources = []
+        targets = []
+        parsed = parse_pages(directory, pages, processes, chunk_size,
+                             batch_pages)
+        for source, result in enumerate(parsed):
+            found, missing = split_links(result[0], index)
+            mtimes[source], sizes[source], digests[source] = result[1:]
+            sources.extend([source] * len(found))
+            targets.extend(found)
+            missing_sources.extend([source] * len(missing))
+            missing_names.extend(missing)
+            if len(targets) >= batch_pages * 64 or source == len(pages) - 1:
+                rows = np.empty((len(targets), 2), dtype=dtype)
+                rows[:, 0] = sources
+                rows[:, 1] = targets
+                rows.tofile(f)
+                edges += len(rows)
+                sources = []
+                targets = []
+
+    # Copy the links into a .npy file now that their number is known
+    written = np.lib.format.open_memmap(os.path.join(output, EDGES_FILE),
+                                        mode="w+", dtype=dtype,
+                                        shape=(edges, 2))
+    if edges:
+        written[:] = np.memmap(scratch, dtype=dtype, mode="r",
+                               shape=(edges, 2))
+    written.flush()
+    del written
+    os.remove(scratch)
+
+    write_missing(output, np.array(missing_sources, dtype=dtype),
+                  missing_names)
+    write_files(output, mtimes, sizes, digests)
+
+    # Ranks saved for an earlier crawl no longer match the pages
+    ranks = os.path.join(output, RANKS_FILE)
+    if os.path.exists(ranks):
+        os.remove(ranks)
+    return len(pages), edges
+
+
+def load_crawl(output, mmap_mode="r"):
+    """
+    Returns (pages, edges) for a crawl written by crawl_to_disk, with
+    edges memory-mapped from disk unless mmap_mode is None.
+    """
+    with open(os.path.join(output, PAGES_FILE), encoding="utf-8") as f:
+        pages = f.read().splitlines()
+    edges = np.load(os.path.join(output, EDGES_FILE), mmap_mode=mmap_mode)
+    return pages, edges
+
+
+def load_graph(output):
+    """Returns the LinkGraph of a crawl written by crawl_to_disk."""
+    pages, edges = load_crawl(output)
+    return LinkGraph.from_edges(len(pages), edges[:, 0], edges[:, 1], pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl a directory tree of HTML pages to edge files"
+    )
+    parser.add_argument("directory")
+    parser.add_argument("output")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    pages, edges = crawl_to_disk(args.directory, args.output, args.processes)
+    print(f"Crawled {pages} pages with {edges} links into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import os
+
+import numpy as np
+
+from crawler import (CHUNK_SIZE, EDGES_FILE, FILES_FILE, MISSING_FILE,
+                     MISSING_SOURCES_FILE, PAGES_FILE, RANKS_FILE,
+                     crawl_to_disk, find_pages, load_crawl, load_graph,
+                     new_digest, parse_pages, split_links, write_files,
+                     write_missing, write_pages)
+from pagerank import DAMPING
+from sparse import TOLERANCE, power_iteration
+
+
+def file_digest(path, chunk_size=CHUNK_SIZE):
+    """Returns the digest of the contents of the file at path."""
+    digest = new_digest()
+    with open(path, "rb") as f:
+        while data := f.read(chunk_size):
+            digest.update(data)
+    return digest.digest()
+
+
+def load_missing(output):
+    sources = np.load(os.path.join(output, MISSING_SOURCES_FILE))
+    with open(os.path.join(output, MISSING_FILE), encoding="utf-8") as f:
+        names = f.read().splitlines()
+    return sources, names
+
+
+def update_crawl(directory, output, processes=1):
+    """
+    Brings a crawl written by crawl_to_disk up to date with the directory
+    tree, returning the lists of pages added, removed and changed.
+
+    A page is unchanged if its file has the same modification time and
+    size as when it was last crawled, or else the same hash. Only added
+    and changed pages are parsed again: the links of every other page
+    are kept and renumbered, and links to pages that were missing are
+    added once those pages exist. Saved ranks are carried over to the
+    new numbering, with added pages given the average rank.
+    """
+    old_pages, old_edges = load_crawl(output, mmap_mode=None)
+    with np.load(os.path.join(output, FILES_FILE)) as files:
+        old_mtimes = files["mtime"]
+        old_sizes = files["size"]
+        old_digests = files["digest"]
+    old_missing_sources, old_missing_names = load_missing(output)
+
+    pages = find_pages(directory)
+    index = {page: i for i, page in enumerate(pages)}
+    old_index = {page: i for i, page in enumerate(old_pages)}
+    dtype = np.int32 if len(pages) < 2**31 else np.int64
+    renumber = np.full(len(old_pages), -1, dtype=np.int64)
+    mtimes = np.zeros(len(pages), dtype=np.int64)
+    sizes = np.zeros(len(pages), dtype=np.int64)
+    digests = np.zeros(len(pages), dtype=old_digests.dtype)
+
+    # Find which pages have to be parsed again
+    added = []
+    changed = []
+    for i, page in enumerate(pages):
+        j = old_index.get(page)
+        if j is None:
+            added.append(page)
+            continue
+        renumber[j] = i
+        path = os.path.join(directory, *page.split("/"))
+        info = os.stat(path)
+        mtimes[i], sizes[i], digests[i] = (info.st_mtime_ns, info.st_size,
+                                           old_digests[j])
+        if info.st_mtime_ns == old_mtimes[j] and info.st_size == old_sizes[j]:
+            continue
+        if (info.st_size == old_sizes[j]
+                and file_digest(path) == bytes(digests[i])):
+            continue
+        changed.append(page)
+    removed = [page for page in old_pages if page not in index]
+    stale = np.zeros(len(pages), dtype=bool)
+    stale[[index[page] for page in added + changed]] = True
+
+    # Keep the links of unchanged pages, remembering links to removed
+    # pages in case they come back
+    sources = renumber[old_edges[:, 0]]
+    targets = renumber[old_edges[:, 1]]
+    kept = sources >= 0
+    kept[kept] = ~stale[sources[kept]]
+    lost = kept & (targets < 0)
+    kept &= targets >= 0
+    missing_sources = sources[lost].tolist()
+    missing_names = [old_pages[j] for j in old_edges[lost, 1].tolist()]
+    source_parts = [sources[kept]]
+    target_parts = [targets[kept]]
+
+    # Links to missing pages become links once the pages exist
+    if len(old_missing_sources):
+        old_sources = renumber[old_missing_sources]
+        found_sources = []
+        found_targets = []
+        for source, name in zip(old_sources.tolist(), old_missing_names):
+            if source < 0 or stale[source]:
+                continue
+            if name in index:
+                found_sources.append(source)
+                found_targets.append(index[name])
+            else:
+                missing_sources.append(source)
+                missing_names.append(name)
+        source_parts.append(np.array(found_sources, dtype=np.int64))
+        target_parts.append(np.array(found_targets, dtype=np.int64))
+
+    # Parse added and changed pages
+    parsing = [page for page in pages if stale[index[page]]]
+    parsed = parse_pages(directory, parsing, processes)
+    for page, result in zip(parsing, parsed):
+        source = index[page]
+        found, missing = split_links(result[0], index)
+        mtimes[source], sizes[source], digests[source] = result[1:]
+        source_parts.append(np.full(len(found), source, dtype=np.int64))
+        target_parts.append(np.array(found, dtype=np.int64))
+        missing_sources.extend([source] * len(missing))
+        missing_names.extend(missing)
+
+    # Write the crawl sorted by source and then target, as crawl_to_disk
+    # does, so that ranks come out the same as after a full crawl
+    sources = np.concatenate(source_parts)
+    targets = np.concatenate(target_parts)
+    order = np.lexsort((targets, sources))
+    edges = np.empty((len(order), 2), dtype=dtype)
+    edges[:, 0] = sources[order]
+    edges[:, 1] = targets[order]
+    np.save(os.path.join(output, EDGES_FILE), edges)
+    write_pages(output, pages)
+    write_missing(output, np.array(missing_sources, dtype=dtype),
+                  missing_names)
+    write_files(output, mtimes, sizes, digests)
+
+    ranks_path = os.path.join(output, RANKS_FILE)
+    if os.path.exists(ranks_path):
+        old_ranks = np.load(ranks_path)
+        ranks = np.full(len(pages), 1 / max(1, len(pages)))
+        moved = renumber >= 0
+        ranks[renumber[moved]] = old_ranks[moved]
+        if ranks.sum() > 0:
+            ranks /= ranks.sum()
+        np.save(ranks_path, ranks)
+    return added, removed, changed
+
+
+def update_pagerank(directory, output, damping=DAMPING, tolerance=TOLERANCE,
+                    processes=1):
+    """
+    Returns (graph, ranks, residuals) for the pages in a directory tree,
+    crawled into output, as power_iteration does.
+
+    The first call crawls the whole tree. Later calls only parse pages
+    that were added or changed since, and start power iteration from
+    the ranks saved by the previous call, so a corpus where few pages
+    changed needs only a few iterations.
+    """
+    if os.path.exists(os.path.join(output, PAGES_FILE)):
+        update_crawl(directory, output, processes)
+    else:
+        crawl_to_disk(directory, output, processes)
+    graph = load_graph(output)
+    ranks_path = os.path.join(output, RANKS_FILE)
+    start = np.load(ranks_path) if os.path.exists(ranks_path) else None
+    ranks, residuals = power_iteration(graph, damping, tolerance, ranks=start)
+    np.save(ranks_path, ranks)
+    return graph, ranks, residuals
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Update the PageRank of a directory tree of pages"
+    )
+    parser.add_argument("directory")
+    parser.add_argument("output")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    graph, ranks, residuals = update_pagerank(args.directory, args.output,
+                                              processes=args.processes)
+    print(f"{graph.page_count()} pages, {graph.edge_count()} links, "
+          f"{len(residuals)} iterations")
+    for page in np.argsort(-ranks, kind="stable")[:args.top].tolist():
+        print(f"  {graph.pages[page]}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
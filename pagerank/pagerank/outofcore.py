@@ -0,0 +1,263 @@
+import argparse
+import mmap
+import os
+import time
+
+import numpy as np
+
+from crawler import PAGES_FILE
+from pagerank import DAMPING
+from sparse import MAX_ITERATIONS, TOLERANCE
+
+# Memory allowed by default for rank vectors and the links being read, on
+# top of what Python itself uses
+MEMORY_LIMIT = 1 << 30
+
+# Vectors with a value per page kept in memory: the ranks, each page's
+# share of its rank per link, the rank it passes along each link, the new
+# ranks, and the sum over one block
+VECTORS = 5
+
+# Bytes in memory per link of a block besides its row of the file: its
+# source and target as 64-bit integers and the rank it passes along
+BYTES_PER_LINK = 24
+
+# Pages whose links are generated at a time by write_random_edges
+GENERATE_PAGES = 1 << 14
+
+
+class EdgeFile():
+    """
+    A .npy file of (source, target) rows of page numbers sorted by
+    source, such as edges.npy written by crawl_to_disk, memory-mapped
+    and read a block of links at a time.
+
+    Pages of the file are released after each block is read, so only
+    the block being used takes up memory.
+
+    The number of pages is read from the pages.txt written beside the
+    file by crawl_to_disk unless given, since pages without any links
+    do not appear in the file.
+    """
+
+    def __init__(self, path, pages=None):
+        with open(path, "rb") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+            shape, fortran_order, dtype = header
+            if len(shape) != 2 or shape[1] != 2 or fortran_order:
+                raise ValueError("not an array of (source, target) rows")
+            if dtype.kind not in "iu":
+                raise ValueError("page numbers must be integers")
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self.mmap, "madvise"):
+            self.mmap.madvise(mmap.MADV_SEQUENTIAL)
+        self.offset = offset
+        self.row_bytes = 2 * dtype.itemsize
+        self.edges = np.frombuffer(self.mmap, dtype=dtype,
+                                   count=2 * shape[0],
+                                   offset=offset).reshape(shape)
+        if pages is None:
+            pages = count_pages(os.path.dirname(os.path.abspath(path)))
+        if pages < 1:
+            raise ValueError("an edge file needs at least one page")
+        self.pages = pages
+
+    def edge_count(self):
+        return len(self.edges)
+
+    def nbytes(self):
+        return self.edges.nbytes
+
+    def blocks(self, size):
+        """Yields (sources, targets) arrays for each block of size links."""
+        for start in range(0, len(self.edges), size):
+            rows = self.edges[start:start + size]
+            yield rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64)
+            self.release(start, start + len(rows))
+
+    def release(self, start, stop):
+        """Lets the operating system drop the pages of rows start:stop."""
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        first = self.offset + start * self.row_bytes
+        first -= first % mmap.PAGESIZE
+        last = self.offset + stop * self.row_bytes
+        self.mmap.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+    def out_degree(self, size):
+        """Returns the number of links on each page, reading size at a time."""
+        degree = np.zeros(self.pages, dtype=np.int64)
+        for sources, _ in self.blocks(size):
+            if len(sources):
+                # Sources are sorted, so a block covers a range of pages
+                first = sources[0]
+                sources -= first
+                counts = np.bincount(sources)
+                degree[first:first + len(counts)] += counts
+        return degree
+
+    def close(self):
+        self.edges = None
+        self.mmap.close()
+
+
+def count_pages(directory):
+    """
+    Returns the number of pages listed in the pages.txt of a crawl
+    directory, without reading the whole list into memory.
+    """
+    path = os.path.join(directory, PAGES_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"no {PAGES_FILE} beside the edge file, so the "
+                         "number of pages must be given")
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def block_size(edge_file, memory_limit):
+    """
+    Returns how many links of an EdgeFile can be read at a time with the
+    rank vectors of its pages, keeping within memory_limit bytes.
+    """
+    spare = memory_limit - VECTORS * 8 * edge_file.pages
+    per_link = BYTES_PER_LINK + edge_file.row_bytes
+    if spare < per_link:
+        raise ValueError("memory limit leaves no room for links")
+    return spare // per_link
+
+
+def pass_ranks(edge_file, values, size):
+    """
+    Returns, for each page, the sum of values over the links into it,
+    reading the links size at a time.
+    """
+    count = len(values)
+    result = np.zeros(count)
+    for sources, targets in edge_file.blocks(size):
+        weights = values[sources]
+        if len(targets) * 4 >= count:
+            result += np.bincount(targets, weights, minlength=count)
+        else:
+            np.add.at(result, targets, weights)
+    return result
+
+
+def out_of_core_pagerank(edge_file, damping, tolerance=TOLERANCE,
+                         max_iterations=MAX_ITERATIONS,
+                         memory_limit=MEMORY_LIMIT, ranks=None,
+                         report=None):
+    """
+    Returns (ranks, residuals, seconds) for the pages of an EdgeFile:
+    the PageRank of every page, and the L1 change of the ranks and time
+    taken in each iteration of power iteration.
+
+    Only vectors of ranks are kept in memory. Each iteration reads the
+    links from the file again in blocks as large as memory_limit allows,
+    and each page passes its rank along its links in the block. If
+    given, report(iteration, residual, seconds) is called after each
+    iteration.
+    """
+    count = edge_file.pages
+    size = block_size(edge_file, memory_limit)
+    degree = edge_file.out_degree(size)
+    dangling = degree == 0
+    share = np.zeros(count)
+    share[~dangling] = 1 / degree[~dangling]
+    del degree
+    if ranks is None:
+        ranks = np.full(count, 1 / count)
+
+    residuals = []
+    seconds = []
+    for iteration in range(max_iterations):
+        start = time.perf_counter()
+        values = ranks * share
+        updated = pass_ranks(edge_file, values, size)
+        updated *= damping
+        updated += (damping * ranks[dangling].sum() + 1 - damping) / count
+
+        # Reuse values to measure the change without more vectors
+        np.subtract(updated, ranks, out=values)
+        np.abs(values, out=values)
+        residuals.append(float(values.sum()))
+        del values
+        ranks = updated
+        seconds.append(time.perf_counter() - start)
+        if report is not None:
+            report(iteration, residuals[-1], seconds[-1])
+        if residuals[-1] < tolerance:
+            break
+    return ranks, residuals, seconds
+
+
+def write_random_edges(path, pages, degree, seed=None, skew=1.0):
+    """
+    Writes a source-sorted edge file of random links between `pages`
+    pages, with `degree` links per page on average, generating a block
+    of pages at a time so the file can be larger than memory. Link
+    targets follow a power law with exponent skew, as in random_graph,
+    and pages may link to the same page more than once. Returns the
+    number of links written.
+    """
+    rng = np.random.default_rng(seed)
+    degrees = rng.poisson(degree, size=pages)
+    popularity = np.cumsum(1 / np.arange(1, pages + 1) ** skew)
+    popularity /= popularity[-1]
+    shuffle = rng.permutation(pages)
+    dtype = np.int32 if pages < 2**31 else np.int64
+    total = int(degrees.sum())
+
+    # Write the header, then append blocks of links to the file directly
+    # rather than through a memory map, which would keep them in memory
+    header = np.lib.format.open_memmap(path, mode="w+", dtype=dtype,
+                                       shape=(total, 2))
+    offset = header.offset
+    del header
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        for start in range(0, pages, GENERATE_PAGES):
+            stop = min(start + GENERATE_PAGES, pages)
+            sources = np.repeat(np.arange(start, stop), degrees[start:stop])
+            targets = np.minimum(np.searchsorted(popularity,
+                                                 rng.random(len(sources))),
+                                 pages - 1)
+            rows = np.empty((len(sources), 2), dtype=dtype)
+            rows[:, 0] = sources
+            rows[:, 1] = shuffle[targets]
+            rows.tofile(f)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="PageRank of an edge file larger than memory"
+    )
+    parser.add_argument("edges")
+    parser.add_argument("--pages", type=int)
+    parser.add_argument("--memory-limit", type=int, default=MEMORY_LIMIT)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    edge_file = EdgeFile(args.edges, args.pages)
+    megabytes = edge_file.nbytes() / 1e6
+
+    def report(iteration, residual, seconds):
+        print(f"iteration {iteration + 1}: residual {residual:.2e}, "
+              f"{seconds:.2f}s, {megabytes / seconds:.1f} MB/s")
+
+    ranks, _, _ = out_of_core_pagerank(edge_file, DAMPING, args.tolerance,
+                                       memory_limit=args.memory_limit,
+                                       report=report)
+    edge_file.close()
+    for page in np.argsort(-ranks, kind="stable")[:args.top].tolist():
+        print(f"  {page}: {ranks[page]:.6f}")
+
+
+if __name__ == "__main__":
+    main()
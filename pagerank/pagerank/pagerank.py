@@ -1,8 +1,11 @@
 import os
-import random
 import re
 import sys
-from copy import deepcopy
+
+from sampler import sample_ranks
+from personalized import PersonalizedRanks
+from solvers import SOLVERS
+from sparse import TOLERANCE, LinkGraph
 
 DAMPING = 0.85
 SAMPLES = 10000
@@ -49,111 +52,88 @@ def crawl(directory):
     return pages
 
 
-def transition_model(corpus: dict, page, damping_factor):
+def transition_model(corpus: dict, page, damping_factor, teleport=None):
     """
     Return a probability distribution over which page to visit next,
     given a current page.
 
     With probability `damping_factor`, choose a link at random
     linked to by `page`. With probability `1 - damping_factor`, choose
-    a link at random chosen from all pages in the corpus.
+    a link at random chosen from all pages in the corpus, or according
+    to `teleport`, a dict from pages to probabilities, if given.
     """
     prob = dict()
     N = len(corpus.keys())
+    if teleport is None:
+        teleport = {key: 1 / N for key in corpus}
     # print(page)
     # print(corpus[page])
     if len(corpus[page])==0:
-        probab = 1 / N
         for key in corpus.keys():
-            prob[key] = probab
+            prob[key] = teleport.get(key, 0)
 
     else:
-        addedprobab = (1 - damping_factor) / N
         valueN = len(corpus[page])
         for key in corpus.keys():
-            prob[key] = addedprobab
+            prob[key] = (1 - damping_factor) * teleport.get(key, 0)
         for link in corpus[page]:
-            prob[link] += 0.85/valueN
+            prob[link] += damping_factor/valueN
 
     return prob
     
         
-def sample_pagerank(corpus: dict, damping_factor, n):
+def sample_pagerank(corpus: dict, damping_factor, n, seed=None,
+                    processes=1):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
 
+    Many surfers walk at once over arrays of each page's links, so a
+    step costs the same however many pages there are. `seed` makes the
+    samples reproducible, and `processes` splits them between workers.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    page = random.choice(list(corpus.keys()))
-    # print(page)
-    rank = dict()
-    for key in corpus.keys():
-        rank[key] = 0
-
-    for _ in range(n):
-        transprob = transition_model(corpus, page, damping_factor)
-        pagelist = list(transprob.keys())
-        weight = []
-        for key in transprob.keys():
-            weight.append(transprob[key])
-
-        rank[page] += 1
-
-        plist = random.choices(pagelist, weight)
-        page = plist[0] 
-    
-    for page in rank.keys():
-        rank[page] = rank[page] / n
-
-    return rank
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = sample_ranks(graph, damping_factor, n, seed=seed,
+                         processes=processes)
+    return graph.rank_dict(ranks)
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     method="power"):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
+    The corpus is turned into a sparse matrix of links once, and the
+    ranks are updated with the solver named by `method` in
+    solvers.SOLVERS, vectorized power iteration by default, until they
+    change by less than `tolerance` in total.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    rank = dict()
-    newrank = dict()
-    for key in corpus.keys():
-        rank[key] = 0
-        newrank[key] = 0
-    
-    N = len(corpus.keys())
-
-    for key in rank:
-        rank[key] = 1/N
-    # print(rank)
+    graph = LinkGraph.from_corpus(corpus)
+    ranks, _ = SOLVERS[method](graph, damping_factor, tolerance)
+    return graph.rank_dict(ranks)
 
-    while True:
-        for page_p in corpus.keys():
-            prob = 0
-            for page_i in corpus.keys():
-                if len(corpus[page_i]) == 0:
-                    prob += damping_factor*(rank[page_i]/N)
-                elif page_p in corpus[page_i]:
-                    prob += damping_factor*(rank[page_i]/(len(corpus[page_i]))) 
-
-            prob += (1 - damping_factor) / N
-            newrank[page_p] = prob
+def topic_pagerank(corpus, damping_factor, seed_sets, tolerance=TOLERANCE):
+    """
+    Return personalized PageRank values for each set of seed pages, in
+    which the random surfer only ever jumps to one of the seed pages.
 
-        differencelist = [abs(newrank[key] - rank[key]) for key in corpus.keys()]
-        # print(newrank)
-        maxdiff = max(differencelist)
+    Every seed set is solved together in one batched iteration.
 
-        if maxdiff<0.001:
-            break
-        
-        rank = deepcopy(newrank)
-        newrank = dict()
-            
-    return rank
+    Return a list with a dictionary for each seed set, where keys are
+    page names and values are their PageRank value for that seed set.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    personalized = PersonalizedRanks(graph, damping_factor, tolerance)
+    return [graph.rank_dict(ranks)
+            for ranks in personalized.ranks(seed_sets)]
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,131 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from sparse import MAX_ITERATIONS, TOLERANCE
+
+# Columns of ranks updated together, which share each pass over the links
+BATCH_COLUMNS = 64
+
+# Rank vectors kept by a PersonalizedRanks cache
+CACHE_SIZE = 1024
+
+
+def seed_teleport(graph, seed_sets):
+    """
+    Returns a teleport matrix with a column for each set of page names,
+    spreading the jumps of that column evenly over the pages in the set.
+    """
+    index = {page: i for i, page in enumerate(graph.pages)}
+    teleport = np.zeros((graph.page_count(), len(seed_sets)))
+    for column, seeds in enumerate(seed_sets):
+        rows = set()
+        for page in seeds:
+            if page not in index:
+                raise ValueError(f"unknown seed page {page!r}")
+            rows.add(index[page])
+        if not rows:
+            raise ValueError("empty seed set")
+        teleport[list(rows), column] = 1 / len(rows)
+    return teleport
+
+
+def personalized_pagerank(graph, damping, teleport, tolerance=TOLERANCE,
+                          max_iterations=MAX_ITERATIONS):
+    """
+    Returns (ranks, residuals) for every column of a teleport matrix,
+    with a row per page of a LinkGraph, solved together.
+
+    Column j of ranks is the PageRank of a surfer who jumps according to
+    column j of teleport, normalized to sum to 1, both at random and from
+    pages without links. Each iteration multiplies the link matrix by all
+    unconverged columns at once, a batch of columns at a time, and
+    residuals holds the largest L1 change of any column in it.
+    """
+    teleport = np.array(teleport, dtype=float, ndmin=2)
+    if teleport.shape[0] != graph.page_count():
+        raise ValueError("teleport needs a row for every page")
+    totals = teleport.sum(axis=0)
+    if (teleport < 0).any() or (totals <= 0).any():
+        raise ValueError("teleport columns must be non-negative and nonzero")
+    teleport /= totals
+
+    # Each batch keeps its unconverged columns together in memory, and
+    # columns are copied out to ranks once they converge
+    ranks = np.empty_like(teleport)
+    batches = []
+    for start in range(0, teleport.shape[1], BATCH_COLUMNS):
+        columns = np.arange(start, min(start + BATCH_COLUMNS,
+                                       teleport.shape[1]))
+        jumps = np.ascontiguousarray(teleport[:, columns])
+        batches.append((columns, jumps, jumps.copy()))
+    weights = graph.inverse_degree[:, np.newaxis]
+
+    residuals = []
+    while batches and len(residuals) < max_iterations:
+        largest = 0.0
+        remaining = []
+        for columns, jumps, current in batches:
+            dangling = current[graph.dangling].sum(axis=0)
+            updated = graph.pull(current * weights)
+            updated *= damping
+            updated += jumps * (damping * dangling + 1 - damping)
+            changes = np.abs(updated - current).sum(axis=0)
+            largest = max(largest, float(changes.max()))
+            done = changes < tolerance
+            if done.any():
+                ranks[:, columns[done]] = updated[:, done]
+                if done.all():
+                    continue
+                columns = columns[~done]
+                jumps = np.ascontiguousarray(jumps[:, ~done])
+                updated = np.ascontiguousarray(updated[:, ~done])
+            remaining.append((columns, jumps, updated))
+        residuals.append(largest)
+        batches = remaining
+
+    for columns, _, current in batches:
+        ranks[:, columns] = current
+    return ranks, residuals
+
+
+class PersonalizedRanks():
+    """
+    Personalized PageRank of a LinkGraph for sets of seed pages, keeping
+    the ranks of the most recently used seed sets.
+    """
+
+    def __init__(self, graph, damping, tolerance=TOLERANCE,
+                 size=CACHE_SIZE):
+        self.graph = graph
+        self.damping = damping
+        self.tolerance = tolerance
+        self.size = size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def ranks(self, seed_sets):
+        """
+        Returns the rank vector of each set of seed page names, solving
+        every seed set not in the cache in one batch.
+        """
+        keys = [frozenset(seeds) for seeds in seed_sets]
+        missing = list(dict.fromkeys(key for key in keys
+                                     if key not in self.cache))
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        if missing:
+            teleport = seed_teleport(self.graph, missing)
+            ranks, _ = personalized_pagerank(self.graph, self.damping,
+                                             teleport, self.tolerance)
+            for column, key in enumerate(missing):
+                self.cache[key] = ranks[:, column].copy()
+
+        results = []
+        for key in keys:
+            self.cache.move_to_end(key)
+            results.append(self.cache[key])
+        while len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return results
@@ -0,0 +1,131 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Random surfers moved together in each vectorized step
+SURFERS = 1000
+
+# Surfers walk unrecorded until their random start page has at most this
+# much influence on where they are, since each step teleports with
+# probability 1 - damping
+BURN_IN_TOLERANCE = 1e-4
+MAX_BURN_IN = 1000
+
+
+def burn_in_steps(damping):
+    """Returns how many steps a surfer takes before visits are counted."""
+    if damping <= 0:
+        return 0
+    if damping >= 1:
+        return MAX_BURN_IN
+    steps = math.ceil(math.log(BURN_IN_TOLERANCE) / math.log(damping))
+    return min(steps, MAX_BURN_IN)
+
+
+class AliasTable():
+    """
+    Walker's alias method for drawing from a fixed discrete distribution
+    in constant time per draw: pick a column uniformly, then keep it
+    with its probability or take its alias.
+    """
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=float)
+        count = len(weights)
+        scaled = weights * count / weights.sum()
+        self.probability = np.ones(count)
+        self.alias = np.arange(count)
+
+        small = [i for i in range(count) if scaled[i] < 1]
+        large = [i for i in range(count) if scaled[i] >= 1]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+
+    def draw(self, rng, size):
+        """Returns an array of size draws using a NumPy Generator."""
+        columns = rng.integers(0, len(self.alias), size=size)
+        keep = rng.random(size) < self.probability[columns]
+        return np.where(keep, columns, self.alias[columns])
+
+
+def random_walks(graph, damping, samples, surfers=SURFERS, seed=None,
+                 teleport=None):
+    """
+    Returns how many times each page of a LinkGraph was visited over
+    `samples` visits by `surfers` random surfers walking at once.
+
+    Each surfer starts on a random page. At every step it follows a
+    random link on its page with probability damping, and otherwise, or
+    if the page has no links, jumps to a random page. Jumps are uniform,
+    or follow an AliasTable of the teleport distribution if given.
+    Visits are only counted after burn_in_steps(damping) steps.
+    """
+    rng = np.random.default_rng(seed)
+    count = graph.page_count()
+    out_indptr, out_targets = graph.out_links()
+    out_degree = graph.out_degree
+
+    def jump(size):
+        if teleport is None:
+            return rng.integers(0, count, size=size)
+        return teleport.draw(rng, size)
+
+    def move(pages):
+        if not len(out_targets):
+            # Without any links every surfer jumps
+            return jump(len(pages))
+        degree = out_degree[pages]
+        follow = (rng.random(len(pages)) < damping) & (degree > 0)
+        choice = (rng.random(len(pages)) * degree).astype(np.int64)
+        links = out_targets[np.minimum(out_indptr[pages] + choice,
+                                       len(out_targets) - 1)]
+        return np.where(follow, links, jump(len(pages)))
+
+    surfers = max(1, min(surfers, samples))
+    visits = np.zeros(count, dtype=np.int64)
+    pages = jump(surfers)
+    for _ in range(burn_in_steps(damping)):
+        pages = move(pages)
+    remaining = samples
+    while remaining > 0:
+        if remaining < surfers:
+            pages = pages[:remaining]
+        visits += np.bincount(pages, minlength=count)
+        remaining -= len(pages)
+        pages = move(pages)
+    return visits
+
+
+def sample_ranks(graph, damping, samples, surfers=SURFERS, seed=None,
+                 processes=1, teleport=None):
+    """
+    Returns the PageRank of every page of a LinkGraph estimated from
+    `samples` random surfer visits, as an array summing to 1.
+
+    With more than one process the samples are split between worker
+    processes, each with an independent stream from the seed.
+    """
+    if processes <= 1:
+        visits = random_walks(graph, damping, samples, surfers, seed,
+                              teleport)
+    else:
+        seeds = np.random.SeedSequence(seed).spawn(processes)
+        shares = [samples // processes + (i < samples % processes)
+                  for i in range(processes)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                executor.submit(random_walks, graph, damping, share,
+                                surfers, worker_seed, teleport)
+                for share, worker_seed in zip(shares, seeds) if share
+            ]
+            visits = sum(future.result() for future in futures)
+    return visits / samples
@@ -0,0 +1,241 @@
+import numpy as np
+
+from sparse import MAX_ITERATIONS, TOLERANCE, power_iteration
+
+# Gauss-Seidel updates the pages in this many blocks per sweep, each using
+# the ranks already updated by the blocks before it
+BLOCKS = 64
+
+# Extrapolation replaces the ranks after this many power iterations, once
+# enough earlier iterates are known
+EXTRAPOLATION_PERIOD = 10
+
+# The adaptive solver freezes a page once its rank changes by less than
+# this fraction of its rank, whatever the final tolerance, and only
+# updates the other pages. Whenever a full step then shows the ranks
+# have not converged, every page is updated again and pages are frozen
+# only at a change this many times smaller. It gathers the links of the
+# pages still being updated again each time their number falls by
+# REGATHER_FACTOR.
+FREEZE_TOLERANCE = 1e-3
+FREEZE_TIGHTENING = 10
+REGATHER_FACTOR = 2
+
+
+class RowBlock():
+    """
+    A set of rows of a LinkGraph's matrix of incoming links, for
+    summing over the links into only those pages.
+    """
+
+    def __init__(self, graph, rows):
+        self.rows = rows
+        starts = graph.indptr[rows]
+        lengths = graph.indptr[rows + 1] - starts
+        self.linked = np.flatnonzero(lengths)
+        if len(rows) and np.all(np.diff(rows) == 1):
+            # A range of rows can use the graph's links without copying
+            first = starts[0]
+            self.indices = graph.indices[first:first + lengths.sum()]
+            self.starts = starts[self.linked] - first
+        else:
+            offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            gather = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1],
+                                                        lengths)
+            self.indices = graph.indices[gather]
+            self.starts = offsets[self.linked]
+
+    def pull(self, values):
+        """
+        Returns, for each row, the sum of values over the pages that link
+        to that row's page.
+        """
+        result = np.zeros(len(self.rows))
+        if len(self.indices):
+            result[self.linked] = np.add.reduceat(values[self.indices],
+                                                  self.starts)
+        return result
+
+
+def initial_ranks(graph, ranks):
+    count = graph.page_count()
+    if ranks is None:
+        return np.full(count, 1 / count)
+    return np.array(ranks, dtype=float)
+
+
+def gauss_seidel(graph, damping, tolerance=TOLERANCE,
+                 max_iterations=MAX_ITERATIONS, ranks=None):
+    """
+    Returns (ranks, residuals) as power_iteration does, updating the
+    ranks in place block by block so that later pages in a sweep already
+    see the new ranks of earlier ones.
+    """
+    count = graph.page_count()
+    ranks = initial_ranks(graph, ranks)
+    size = -(-count // BLOCKS)
+    bounds = [(start, min(start + size, count))
+              for start in range(0, count, size)]
+    blocks = [RowBlock(graph, np.arange(start, stop))
+              for start, stop in bounds]
+    is_dangling = graph.out_degree == 0
+
+    residuals = []
+    for _ in range(max_iterations):
+        previous = ranks.copy()
+        values = ranks * graph.inverse_degree
+        dangling = ranks[is_dangling].sum()
+        for (start, stop), block in zip(bounds, blocks):
+            updated = damping * block.pull(values)
+            updated += (damping * dangling + 1 - damping) / count
+            dangling += (updated - ranks[start:stop])[
+                is_dangling[start:stop]
+            ].sum()
+            ranks[start:stop] = updated
+            values[start:stop] = updated * graph.inverse_degree[start:stop]
+        ranks /= ranks.sum()
+        residuals.append(float(np.abs(ranks - previous).sum()))
+        if residuals[-1] < tolerance:
+            break
+    return ranks, residuals
+
+
+def aitken(iterates):
+    """
+    Returns the Aitken delta-squared extrapolation of the last three
+    iterates, keeping the last iterate for pages where it is unstable.
+    """
+    first, second, third = iterates[-3:]
+    step = second - first
+    curvature = third - 2 * second + first
+    result = third.copy()
+    usable = np.abs(curvature) > 1e-15
+    result[usable] = first[usable] - step[usable] ** 2 / curvature[usable]
+    result[result <= 0] = third[result <= 0]
+    return result
+
+
+def quadratic(iterates):
+    """
+    Returns the quadratic extrapolation of the last four iterates, which
+    assumes the ranks are a combination of the first three eigenvectors
+    and solves for the coefficients of their minimal polynomial by least
+    squares (Kamvar et al., 2003).
+    """
+    first, second, third, fourth = iterates[-4:]
+    matrix = np.column_stack([second - first, third - first])
+    gamma, *_ = np.linalg.lstsq(matrix, -(fourth - first), rcond=None)
+    beta = [gamma[0] + gamma[1] + 1, gamma[1] + 1, 1]
+    return beta[0] * second + beta[1] * third + beta[2] * fourth
+
+
+def extrapolated_iteration(graph, damping, tolerance, max_iterations, ranks,
+                           extrapolate, history):
+    """
+    Returns (ranks, residuals) as power_iteration does, trying
+    extrapolate(iterates) of the last `history` iterates every
+    EXTRAPOLATION_PERIOD iterations.
+
+    The iteration after each try steps both the extrapolated and the
+    plain ranks, and goes on from whichever changes less, so that
+    extrapolation never makes the residual worse, at the cost of one
+    more step.
+    """
+    ranks = initial_ranks(graph, ranks)
+    iterates = [ranks]
+    trial = None
+    residuals = []
+    for iteration in range(1, max_iterations + 1):
+        updated = graph.step(ranks, damping)
+        residual = float(np.abs(updated - ranks).sum())
+        if trial is not None:
+            stepped = graph.step(trial, damping)
+            trial_residual = float(np.abs(stepped - trial).sum())
+            if trial_residual < residual:
+                ranks, updated, residual = trial, stepped, trial_residual
+                iterates = [ranks]
+            trial = None
+        residuals.append(residual)
+        ranks = updated
+        if residuals[-1] < tolerance:
+            break
+        iterates = iterates[1 - history:] + [ranks]
+        if iteration % EXTRAPOLATION_PERIOD == 0 and len(iterates) == history:
+            extrapolated = np.abs(extrapolate(iterates))
+            if np.isfinite(extrapolated).all() and extrapolated.sum() > 0:
+                trial = extrapolated / extrapolated.sum()
+    return ranks, residuals
+
+
+def aitken_iteration(graph, damping, tolerance=TOLERANCE,
+                     max_iterations=MAX_ITERATIONS, ranks=None):
+    """Power iteration with periodic Aitken extrapolation."""
+    return extrapolated_iteration(graph, damping, tolerance, max_iterations,
+                                  ranks, aitken, 3)
+
+
+def quadratic_iteration(graph, damping, tolerance=TOLERANCE,
+                        max_iterations=MAX_ITERATIONS, ranks=None):
+    """Power iteration with periodic quadratic extrapolation."""
+    return extrapolated_iteration(graph, damping, tolerance, max_iterations,
+                                  ranks, quadratic, 4)
+
+
+def adaptive_iteration(graph, damping, tolerance=TOLERANCE,
+                       max_iterations=MAX_ITERATIONS, ranks=None):
+    """
+    Returns (ranks, residuals) as power_iteration does, no longer
+    updating pages whose ranks have converged (Kamvar et al., 2004).
+
+    Once every page is frozen or the ranks change by less than
+    tolerance, a full step checks the ranks, and if they still change
+    by tolerance or more every page is updated again, freezing pages
+    at a FREEZE_TIGHTENING times smaller change than before.
+    """
+    count = graph.page_count()
+    ranks = initial_ranks(graph, ranks)
+    everything = np.arange(count)
+    block = RowBlock(graph, everything)
+    freeze = FREEZE_TOLERANCE
+    residuals = []
+    while len(residuals) < max_iterations:
+        values = ranks * graph.inverse_degree
+        spread = (damping * ranks[graph.dangling].sum() + 1 - damping) / count
+        updated = damping * block.pull(values) + spread
+        change = np.abs(updated - ranks[block.rows])
+        ranks[block.rows] = updated
+        residuals.append(float(change.sum()))
+        if len(block.rows) == count and residuals[-1] < tolerance:
+            break
+
+        remaining = block.rows[change >= freeze * updated]
+        if len(remaining) and residuals[-1] >= tolerance:
+            if len(remaining) * REGATHER_FACTOR <= len(block.rows):
+                block = RowBlock(graph, remaining)
+            continue
+
+        # Check the frozen pages with a full step
+        ranks /= ranks.sum()
+        if len(block.rows) < count:
+            if len(residuals) == max_iterations:
+                break
+            updated = graph.step(ranks, damping)
+            residuals.append(float(np.abs(updated - ranks).sum()))
+            ranks = updated
+            if residuals[-1] < tolerance:
+                break
+        freeze /= FREEZE_TIGHTENING
+        block = RowBlock(graph, everything)
+    return ranks, residuals
+
+
+# Solvers taking (graph, damping, tolerance, max_iterations, ranks) and
+# returning (ranks, residuals)
+SOLVERS = {
+    "power": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "aitken": aitken_iteration,
+    "quadratic": quadratic_iteration,
+    "adaptive": adaptive_iteration
+}
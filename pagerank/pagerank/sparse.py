@@ -0,0 +1,180 @@
+import numpy as np
+
+# Power iteration stops once the ranks change by less than this in total
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+# Pulling a matrix of values gathers the values along about this many
+# bytes of links at a time, so that they are summed while still in cache
+TILE_BYTES = 1 << 18
+
+
+class LinkGraph():
+    """
+    Link structure of a corpus as a CSR matrix of incoming links.
+
+    Pages are numbered by their position in `pages`. Row p of the
+    matrix, indices[indptr[p]:indptr[p + 1]], lists the pages that
+    link to page p, and out_degree counts the links on each page.
+    """
+
+    def __init__(self, pages, indptr, indices, out_degree):
+        self.pages = pages
+        self.indptr = indptr
+        self.indices = indices
+        self.out_degree = out_degree
+
+        # Pages without links spread their rank over every page instead
+        self.dangling = np.flatnonzero(out_degree == 0)
+        self.inverse_degree = np.zeros(len(out_degree))
+        linked = out_degree > 0
+        self.inverse_degree[linked] = 1 / out_degree[linked]
+
+        # reduceat cannot produce empty sums, so only rows with incoming
+        # links are summed
+        self.linked_rows = np.flatnonzero(np.diff(indptr))
+        self.row_starts = indptr[self.linked_rows]
+
+        # Built on first use by out_links()
+        self.outgoing = None
+
+    @classmethod
+    def from_edges(cls, count, sources, targets, pages=None):
+        """
+        Builds the graph of count pages from parallel arrays of link
+        sources and targets, which should hold no duplicate links.
+        """
+        sources = np.asarray(sources)
+        targets = np.asarray(targets)
+        dtype = np.int32 if count < 2**31 else np.int64
+        order = np.argsort(targets, kind="stable")
+        indices = sources[order].astype(dtype)
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=count), out=indptr[1:])
+        out_degree = np.bincount(sources, minlength=count)
+        if pages is None:
+            pages = list(range(count))
+        return cls(pages, indptr, indices, out_degree)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """Builds the graph of a corpus dict as returned by crawl."""
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources = []
+        targets = []
+        for page in pages:
+            for link in corpus[page]:
+                sources.append(index[page])
+                targets.append(index[link])
+        return cls.from_edges(len(pages), np.array(sources, dtype=np.int64),
+                              np.array(targets, dtype=np.int64), pages)
+
+    def page_count(self):
+        return len(self.out_degree)
+
+    def edge_count(self):
+        return len(self.indices)
+
+    def out_links(self):
+        """
+        Returns (out_indptr, out_targets), the CSR matrix of outgoing
+        links: page i links to out_targets[out_indptr[i]:out_indptr[i + 1]].
+        """
+        if self.outgoing is None:
+            targets = np.repeat(np.arange(self.page_count()),
+                                np.diff(self.indptr))
+            order = np.argsort(self.indices, kind="stable")
+            out_indptr = np.zeros(self.page_count() + 1, dtype=np.int64)
+            np.cumsum(self.out_degree, out=out_indptr[1:])
+            self.outgoing = (out_indptr, targets[order])
+        return self.outgoing
+
+    def pull(self, values):
+        """
+        Returns, for each page, the sum of values over the pages that
+        link to it. values may also be a matrix with a row per page, to
+        sum every column at once.
+        """
+        result = np.zeros((self.page_count(),) + values.shape[1:])
+        if not len(self.indices):
+            return result
+        if values.ndim == 1:
+            result[self.linked_rows] = np.add.reduceat(values[self.indices],
+                                                       self.row_starts)
+            return result
+
+        # Each page's values should be together in memory to be gathered
+        values = np.ascontiguousarray(values)
+        per_tile = max(1, TILE_BYTES // max(1, values[0].nbytes))
+        cuts = np.unique(np.searchsorted(
+            self.row_starts, np.arange(0, len(self.indices), per_tile)
+        ))
+        cuts = np.append(cuts, len(self.linked_rows))
+        bounds = np.append(self.row_starts, len(self.indices))
+        for first, last in zip(cuts[:-1].tolist(), cuts[1:].tolist()):
+            start, stop = bounds[first], bounds[last]
+            result[self.linked_rows[first:last]] = np.add.reduceat(
+                values[self.indices[start:stop]],
+                self.row_starts[first:last] - start
+            )
+        return result
+
+    def step(self, ranks, damping):
+        """
+        Returns the ranks after one step of the random surfer: each page
+        passes damping of its rank along its links, or over every page
+        if it has none, and the rest is spread evenly.
+        """
+        count = self.page_count()
+        spread = (damping * ranks[self.dangling].sum() + 1 - damping) / count
+        result = self.pull(ranks * self.inverse_degree)
+        result *= damping
+        result += spread
+        return result
+
+    def rank_dict(self, ranks):
+        """Returns a dict from each page to its rank."""
+        return dict(zip(self.pages, ranks.tolist()))
+
+
+def power_iteration(graph, damping, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, ranks=None):
+    """
+    Returns (ranks, residuals): the PageRank of every page as an array,
+    and the L1 change of the ranks in each iteration.
+
+    Starts from ranks, or the uniform distribution, and iterates until
+    the change is below tolerance or max_iterations is reached.
+    """
+    count = graph.page_count()
+    if ranks is None:
+        ranks = np.full(count, 1 / count)
+    residuals = []
+    for _ in range(max_iterations):
+        updated = graph.step(ranks, damping)
+        residuals.append(float(np.abs(updated - ranks).sum()))
+        ranks = updated
+        if residuals[-1] < tolerance:
+            break
+    return ranks, residuals
+
+
+def random_graph(pages, edges, seed=None, skew=1.0):
+    """
+    Returns the sources and targets of about `edges` distinct random
+    links between `pages` pages, without self-links. Link targets follow
+    a power law with exponent skew, so a few pages are very popular.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, pages + 1) ** skew
+    weights /= weights.sum()
+    sources = rng.integers(0, pages, size=edges, dtype=np.int64)
+    targets = rng.choice(pages, size=edges, p=weights)
+
+    # Shuffle popularity so it is not tied to page numbers
+    targets = rng.permutation(pages)[targets]
+    keys = np.unique(sources * pages + targets)
+    sources, targets = keys // pages, keys % pages
+    keep = sources != targets
+    return sources[keep], targets[keep]